@@ -0,0 +1,109 @@
+"""
+Compares reduced-dimension and quantized embedding modes on the section queries.
+
+For every (dimensions, dtype) mode, each PPM's chunks are indexed in a
+NumpyVectorStore and searched with the section prompts. Recall@k is measured
+against full 3072-dimension float32 vectors. Embeddings go through the
+embedding cache, so each dimension count is only paid for once.
+
+Usage:
+    python -m benchmarks.embedding_mode_benchmark tmp/*.pdf
+    python -m benchmarks.embedding_mode_benchmark --dimensions 1024 256 --k 15 samples/
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_openai import OpenAIEmbeddings
+
+from benchmarks.parser_benchmark import collect_pdfs
+from benchmarks.retriever_benchmark import SECTION_QUERIES, time_queries
+from services.embeddings import create_embeddings
+from services.pdf_text_backends import extract_pages
+from services.token_splitter import create_text_splitter
+from services.vector_index import NumpyVectorStore
+
+FULL_DIMENSIONS = 3072
+DTYPES = ["float32", "float16", "int8"]
+
+
+def embed(texts, dimensions):
+    embeddings = create_embeddings(
+        OpenAIEmbeddings(
+            model="text-embedding-3-large",
+            dimensions=None if dimensions == FULL_DIMENSIONS else dimensions,
+        )
+    )
+    query_vectors = [embeddings.embed_query(query) for query in SECTION_QUERIES.values()]
+    return embeddings, embeddings.embed_documents(texts), query_vectors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("paths", nargs="+", help="PDF files or directories of PDFs")
+    parser.add_argument(
+        "--dimensions", nargs="+", type=int, default=[FULL_DIMENSIONS, 1536, 1024, 512, 256]
+    )
+    parser.add_argument("--k", type=int, default=15)
+    parser.add_argument("--repeats", type=int, default=10)
+    args = parser.parse_args()
+
+    pdfs = collect_pdfs(args.paths)
+    if not pdfs:
+        parser.error("no PDF files found")
+
+    text_splitter = create_text_splitter()
+    totals = {}
+    for pdf_path in pdfs:
+        splits = text_splitter.split_documents(extract_pages(pdf_path, workers=1))
+        texts = [split.page_content for split in splits]
+        metadatas = [split.metadata for split in splits]
+
+        # Reference ranking from full-size float32 vectors
+        embeddings, vectors, query_vectors = embed(texts, FULL_DIMENSIONS)
+        reference = NumpyVectorStore(embeddings, dtype="float32")
+        reference.add_vectors(texts, metadatas, vectors)
+        expected = [
+            set(reference.search_vector(vector, args.k)[0].tolist()) for vector in query_vectors
+        ]
+
+        for dimensions in args.dimensions:
+            embeddings, vectors, query_vectors = embed(texts, dimensions)
+            for dtype in DTYPES:
+                store = NumpyVectorStore(embeddings, dtype=dtype)
+                store.add_vectors(texts, metadatas, vectors)
+                query_seconds, results = time_queries(
+                    lambda vector: store.search_vector(vector, args.k)[0],
+                    query_vectors,
+                    args.repeats,
+                )
+                recall = sum(
+                    len(expected_ids & set(indexes.tolist())) / max(len(expected_ids), 1)
+                    for expected_ids, indexes in zip(expected, results)
+                ) / len(results)
+                total = totals.setdefault(
+                    (dimensions, dtype), {"recall": [], "bytes": 0, "seconds": [], "chunks": 0}
+                )
+                total["recall"].append(recall)
+                total["bytes"] += store.nbytes
+                total["seconds"].append(query_seconds)
+                total["chunks"] += len(texts)
+
+    print(
+        f"{'dimensions':>10} {'dtype':<8} {'recall@' + str(args.k):>10} "
+        f"{'bytes/chunk':>12} {'query ms':>9}"
+    )
+    for (dimensions, dtype), total in totals.items():
+        print(
+            f"{dimensions:>10} {dtype:<8} "
+            f"{sum(total['recall']) / len(total['recall']):>10.3f} "
+            f"{total['bytes'] / max(total['chunks'], 1):>12.0f} "
+            f"{1000 * sum(total['seconds']) / len(total['seconds']):>9.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
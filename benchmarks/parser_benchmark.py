@@ -0,0 +1,123 @@
+"""
+Compares the page text extraction backends on a set of sample PPMs.
+
+Each (backend, file) run happens in a fresh process, so the peak RSS reported
+covers native PyMuPDF allocations as well as Python objects.
+
+Usage:
+    python -m benchmarks.parser_benchmark tmp/*.pdf
+    python -m benchmarks.parser_benchmark --backends pypdf pymupdf samples/
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.pdf_text_backends import PDF_TEXT_BACKENDS, extract_pages
+
+
+def collect_pdfs(paths):
+    pdfs = []
+    for path in paths:
+        if os.path.isdir(path):
+            pdfs.extend(
+                os.path.join(path, name)
+                for name in sorted(os.listdir(path))
+                if name.lower().endswith(".pdf")
+            )
+        else:
+            pdfs.append(path)
+    return pdfs
+
+
+def _run_backend(backend, pdf_path, workers, results):
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    pages = extract_pages(pdf_path, backend=backend, workers=workers)
+    elapsed = time.perf_counter() - started
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put(
+        {
+            "pages": len(pages),
+            "chars": sum(len(page.page_content) for page in pages),
+            "seconds": elapsed,
+            "peak_mb": peak_kb / 1024,
+            "delta_mb": (peak_kb - baseline_kb) / 1024,
+        }
+    )
+
+
+def measure(backend, pdf_path, workers=1):
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(
+        target=_run_backend, args=(backend, pdf_path, workers, results)
+    )
+    process.start()
+    process.join()
+    if process.exitcode != 0:
+        return None
+    return results.get()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("paths", nargs="+", help="PDF files or directories of PDFs")
+    parser.add_argument(
+        "--backends",
+        nargs="+",
+        default=list(PDF_TEXT_BACKENDS),
+        choices=list(PDF_TEXT_BACKENDS),
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="page extraction processes; peak MB only covers the parent when > 1",
+    )
+    args = parser.parse_args()
+
+    pdfs = collect_pdfs(args.paths)
+    if not pdfs:
+        parser.error("no PDF files found")
+
+    print(
+        f"{'backend':<12} {'file':<40} {'pages':>6} {'chars':>10} "
+        f"{'seconds':>8} {'pages/s':>8} {'peak MB':>8} {'+MB':>7}"
+    )
+    totals = {}
+    for backend in args.backends:
+        for pdf_path in pdfs:
+            result = measure(backend, pdf_path, args.workers)
+            name = os.path.basename(pdf_path)[:40]
+            if result is None:
+                print(f"{backend:<12} {name:<40} failed")
+                continue
+            rate = result["pages"] / max(result["seconds"], 1e-9)
+            print(
+                f"{backend:<12} {name:<40} {result['pages']:>6} {result['chars']:>10} "
+                f"{result['seconds']:>8.2f} {rate:>8.1f} {result['peak_mb']:>8.1f} "
+                f"{result['delta_mb']:>7.1f}"
+            )
+            total = totals.setdefault(backend, {"pages": 0, "seconds": 0.0, "peak_mb": 0.0})
+            total["pages"] += result["pages"]
+            total["seconds"] += result["seconds"]
+            total["peak_mb"] = max(total["peak_mb"], result["peak_mb"])
+
+    print()
+    print(f"{'backend':<12} {'pages':>8} {'seconds':>8} {'pages/s':>8} {'max peak MB':>12}")
+    for backend, total in totals.items():
+        rate = total["pages"] / max(total["seconds"], 1e-9)
+        print(
+            f"{backend:<12} {total['pages']:>8} {total['seconds']:>8.2f} "
+            f"{rate:>8.1f} {total['peak_mb']:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
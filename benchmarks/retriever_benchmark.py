@@ -0,0 +1,125 @@
+"""
+Compares the NumPy retriever with the per-document Chroma collection.
+
+Each PPM is split as in the pipeline and embedded once through the
+embedding cache, so repeated runs make no API calls. Every store is then
+built from the same vectors and queried with the section prompts. Recall is
+the share of Chroma's top-k chunks that each NumPy store also returns.
+
+Usage:
+    python -m benchmarks.retriever_benchmark tmp/*.pdf
+    python -m benchmarks.retriever_benchmark --k 15 --repeats 20 samples/
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_chroma import Chroma
+from langchain_openai import OpenAIEmbeddings
+
+from benchmarks.parser_benchmark import collect_pdfs
+from services.embeddings import create_embeddings
+from services.pdf_text_backends import extract_pages
+from services.token_splitter import create_text_splitter
+from services.vector_index import NumpyVectorStore
+from utils.prompts import (
+    compensation_prompt,
+    final_data_table_prompt,
+    leadership_prompt,
+    projected_results_prompt,
+    track_record_prompt,
+    use_of_proceeds_prompt,
+)
+
+SECTION_QUERIES = {
+    "Leadership": leadership_prompt,
+    "Compensation": compensation_prompt,
+    "Track Record": track_record_prompt,
+    "Projected Results": projected_results_prompt(last_10_pages_text=""),
+    "Use of Proceeds": use_of_proceeds_prompt,
+    "Final Data Table": final_data_table_prompt,
+}
+
+
+def time_queries(search, query_vectors, repeats):
+    started = time.perf_counter()
+    for _ in range(repeats):
+        results = [search(vector) for vector in query_vectors]
+    return (time.perf_counter() - started) / (repeats * len(query_vectors)), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("paths", nargs="+", help="PDF files or directories of PDFs")
+    parser.add_argument("--k", type=int, default=15)
+    parser.add_argument("--repeats", type=int, default=10)
+    args = parser.parse_args()
+
+    pdfs = collect_pdfs(args.paths)
+    if not pdfs:
+        parser.error("no PDF files found")
+
+    embeddings = create_embeddings(OpenAIEmbeddings(model="text-embedding-3-large"))
+    query_vectors = [embeddings.embed_query(query) for query in SECTION_QUERIES.values()]
+    text_splitter = create_text_splitter()
+
+    print(
+        f"{'store':<14} {'file':<40} {'chunks':>7} {'build ms':>9} "
+        f"{'query ms':>9} {'recall':>7}"
+    )
+    for pdf_path in pdfs:
+        splits = text_splitter.split_documents(extract_pages(pdf_path, workers=1))
+        texts = [split.page_content for split in splits]
+        metadatas = [split.metadata for split in splits]
+        vectors = embeddings.embed_documents(texts)
+        name = os.path.basename(pdf_path)[:40]
+
+        started = time.perf_counter()
+        chroma = Chroma(collection_name="retriever_benchmark")
+        chroma._collection.add(
+            ids=[str(index) for index in range(len(texts))],
+            embeddings=vectors,
+            documents=texts,
+            metadatas=metadatas,
+        )
+        build_ms = (time.perf_counter() - started) * 1000
+        query_seconds, chroma_results = time_queries(
+            lambda vector: chroma._collection.query(
+                query_embeddings=[vector], n_results=args.k
+            )["ids"][0],
+            query_vectors,
+            args.repeats,
+        )
+        expected = [{int(chunk_id) for chunk_id in ids} for ids in chroma_results]
+        print(
+            f"{'chroma':<14} {name:<40} {len(texts):>7} {build_ms:>9.1f} "
+            f"{query_seconds * 1000:>9.3f} {'-':>7}"
+        )
+        chroma.delete_collection()
+
+        for dtype in ("float32", "float16"):
+            started = time.perf_counter()
+            store = NumpyVectorStore(embeddings, dtype=dtype)
+            store.add_vectors(texts, metadatas, vectors)
+            # Force the contiguous matrix so it counts towards build time
+            store.matrix
+            build_ms = (time.perf_counter() - started) * 1000
+            query_seconds, results = time_queries(
+                lambda vector: store.search_vector(vector, args.k)[0], query_vectors, args.repeats
+            )
+            recall = sum(
+                len(expected_ids & set(indexes.tolist())) / max(len(expected_ids), 1)
+                for expected_ids, indexes in zip(expected, results)
+            ) / len(results)
+            print(
+                f"{'numpy-' + dtype:<14} {name:<40} {len(texts):>7} {build_ms:>9.1f} "
+                f"{query_seconds * 1000:>9.3f} {recall:>7.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Compares the character and token text splitters on a set of sample PPMs.
+
+Pages are extracted once per file, then each splitter chunks the same pages.
+Reported token counts use the text-embedding-3-large tokenizer.
+
+Usage:
+    python -m benchmarks.splitter_benchmark tmp/*.pdf
+    python -m benchmarks.splitter_benchmark --backend pymupdf4llm samples/
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.parser_benchmark import collect_pdfs
+from services.pdf_text_backends import PDF_TEXT_BACKENDS, extract_pages
+from services.token_splitter import create_text_splitter
+from utils.tokens import count_tokens
+
+SPLITTERS = ["recursive", "tokens"]
+
+
+def measure(splitter_name, pages):
+    splitter = create_text_splitter(splitter_name)
+    started = time.perf_counter()
+    chunks = splitter.split_documents(pages)
+    elapsed = time.perf_counter() - started
+    tokens = [count_tokens(chunk.page_content) for chunk in chunks]
+    return {
+        "chunks": len(chunks),
+        "seconds": elapsed,
+        "tokens": tokens,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("paths", nargs="+", help="PDF files or directories of PDFs")
+    parser.add_argument(
+        "--backend", default="pymupdf", choices=list(PDF_TEXT_BACKENDS)
+    )
+    args = parser.parse_args()
+
+    pdfs = collect_pdfs(args.paths)
+    if not pdfs:
+        parser.error("no PDF files found")
+
+    print(
+        f"{'splitter':<10} {'file':<40} {'chunks':>7} {'mean tok':>9} "
+        f"{'stdev tok':>10} {'max tok':>8} {'seconds':>8}"
+    )
+    totals = {name: {"chunks": 0, "seconds": 0.0, "tokens": []} for name in SPLITTERS}
+    for pdf_path in pdfs:
+        pages = extract_pages(pdf_path, backend=args.backend, workers=1)
+        name = os.path.basename(pdf_path)[:40]
+        for splitter_name in SPLITTERS:
+            result = measure(splitter_name, pages)
+            tokens = result["tokens"] or [0]
+            print(
+                f"{splitter_name:<10} {name:<40} {result['chunks']:>7} "
+                f"{statistics.mean(tokens):>9.1f} {statistics.pstdev(tokens):>10.1f} "
+                f"{max(tokens):>8} {result['seconds']:>8.3f}"
+            )
+            total = totals[splitter_name]
+            total["chunks"] += result["chunks"]
+            total["seconds"] += result["seconds"]
+            total["tokens"].extend(result["tokens"])
+
+    print()
+    print(f"{'splitter':<10} {'chunks':>8} {'mean tok':>9} {'stdev tok':>10} {'seconds':>8}")
+    for splitter_name, total in totals.items():
+        tokens = total["tokens"] or [0]
+        print(
+            f"{splitter_name:<10} {total['chunks']:>8} {statistics.mean(tokens):>9.1f} "
+            f"{statistics.pstdev(tokens):>10.1f} {total['seconds']:>8.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
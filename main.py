@@ -1,15 +1,21 @@
 import os
+import time
 from dotenv import load_dotenv
 from services.file_processor import process_file
 from utils.logger import logger
 from services.google_services import (
     load_service_account_credentials,
+    create_drive_client,
     list_files_in_drive,
+    list_changed_pdfs,
+    get_start_page_token,
 )
+from services.download_manager import DownloadManager
 from googleapiclient.discovery import build
+from utils.job_store import JobStore, DONE, FAILED
 from utils.common import (
-    load_processed_file_ids,
-    save_processed_file_ids,
+    load_start_page_token,
+    save_start_page_token,
     sheet_headers,
 )
 
@@ -18,6 +24,14 @@ load_dotenv()
 
 DEAL_ID = os.getenv("DEAL_ID")  # The Deal ID to use during processing
 
+# Change-feed polling. Idle polls back off from the min to the max interval, and
+# the whole folder is re-listed every RECONCILE_INTERVAL seconds to catch
+# anything the feed missed. Kept separate from the webhook's token file.
+POLL_MIN_INTERVAL = float(os.getenv("POLL_MIN_INTERVAL", "5"))
+POLL_MAX_INTERVAL = float(os.getenv("POLL_MAX_INTERVAL", "300"))
+RECONCILE_INTERVAL = float(os.getenv("RECONCILE_INTERVAL", "3600"))
+POLL_PAGE_TOKEN_FILE = os.getenv("POLL_PAGE_TOKEN_FILE", "poll_page_token.txt")
+
 
 def main():
     try:
@@ -40,37 +54,100 @@ def main():
 
         # Load credentials and create service objects
         credentials = load_service_account_credentials(SERVICE_ACCOUNT_FILE, SCOPES)
-        drive_service = build("drive", "v3", credentials=credentials)
+        # Listing and change polling; DRIVE_API_BACKEND picks the client
+        drive_service = create_drive_client(credentials)
         sheets_service = build("sheets", "v4", credentials=credentials)
 
-        # List and process the latest file
-        processed_file_ids = load_processed_file_ids("processed_files.txt")
+        download_manager = DownloadManager(credentials)
 
-        while True:
-            logger.info("Checking for new files in Google Drive folder...")
-            # List files in the specified folder
-            files = list_files_in_drive(drive_service, FOLDER_ID)
-
-            # 'files' is a list of tuples: (file_id, file_name, file_path)
-            for file_id, file_name, file_path in files:
-                if file_id not in processed_file_ids:
-                    logger.info(f"Processing new file: {file_name}")
-                    # Process the PDF file
-                    process_file(
-                        file_name,
-                        file_path,
-                        sheets_service,
-                        SPREADSHEET_ID,
-                        sheet_headers,
-                    )
+        # Durable per-document job state; imports processed_files.txt on first run
+        job_store = JobStore()
+
+        def unprocessed_files(files):
+            for file in files:
+                if job_store.enqueue(file):
+                    job_store.start_attempt(file["id"])
+                    yield file
+                else:
+                    logger.debug(f"File {file['name']} has already been processed.")
+
+        def download_failed(file):
+            job_store.set_state(file["id"], FAILED, "Download failed")
+
+        def process_new_files(files):
+            # Only download the files that have not been processed yet. Downloads
+            # run on the pool while earlier files are being processed here.
+            for file, pdf_source in download_manager.download_many(
+                unprocessed_files(files), on_failure=download_failed
+            ):
+                file_id, file_name = file["id"], file["name"]
+                logger.info(f"Processing new file: {file_name}")
+                # Process the PDF file
+                succeeded = process_file(
+                    file_name,
+                    pdf_source,
+                    sheets_service,
+                    SPREADSHEET_ID,
+                    sheet_headers,
+                    content_hash=file.get("md5Checksum"),
+                    on_stage=lambda stage: job_store.set_state(file_id, stage),
+                )
+                if succeeded:
                     logger.info(f"Extracted data from {file_name}")
-                    # Add the file ID to the set of processed files
-                    processed_file_ids.add(file_id)
+                    job_store.set_state(file_id, DONE)
                 else:
-                    logger.info(f"File {file_name} has already been processed.")
+                    job_store.set_state(file_id, FAILED, "Processing failed")
+
+        # Resume jobs that a previous run left unfinished
+        unfinished = job_store.unfinished_jobs()
+        if unfinished:
+            logger.info(f"Resuming {len(unfinished)} unfinished jobs...")
+            process_new_files(unfinished)
+
+        page_token = load_start_page_token(POLL_PAGE_TOKEN_FILE)
+        last_reconcile = None
+        poll_interval = POLL_MIN_INTERVAL
+
+        while True:
+            try:
+                if (
+                    page_token is None
+                    or last_reconcile is None
+                    or time.monotonic() - last_reconcile >= RECONCILE_INTERVAL
+                ):
+                    # Take the token before listing so changes made during the
+                    # listing are still picked up by the next poll
+                    reconcile_token = get_start_page_token(drive_service)
+                    logger.info("Reconciling the full Google Drive folder...")
+                    # Stream file metadata from the specified folder, page by page.
+                    # A listing error propagates from here, so the token and
+                    # last_reconcile only move on after a complete listing.
+                    process_new_files(list_files_in_drive(drive_service, FOLDER_ID))
+                    page_token = reconcile_token
+                    save_start_page_token(POLL_PAGE_TOKEN_FILE, page_token)
+                    last_reconcile = time.monotonic()
+                    poll_interval = POLL_MIN_INTERVAL
+                else:
+                    logger.debug("Checking the Drive change feed for new files...")
+                    files, new_page_token = list_changed_pdfs(
+                        drive_service, page_token, FOLDER_ID
+                    )
+                    if files:
+                        process_new_files(files)
+                        poll_interval = POLL_MIN_INTERVAL
+                    else:
+                        poll_interval = min(poll_interval * 2, POLL_MAX_INTERVAL)
+
+                    # Only advance the token once its changes have been processed
+                    if new_page_token:
+                        page_token = new_page_token
+                        save_start_page_token(POLL_PAGE_TOKEN_FILE, page_token)
+            except Exception as e:
+                # Keep polling; a failed pass is retried after backing off
+                logger.error(f"An error occurred while polling Google Drive: {e}")
+                poll_interval = min(poll_interval * 2, POLL_MAX_INTERVAL)
 
-            # Save the processed file IDs to a file
-            save_processed_file_ids("processed_files.txt", processed_file_ids)
+            time.sleep(poll_interval)
 
     except Exception as e:
         logger.critical(f"An unexpected error occurred in the main function: {e}")
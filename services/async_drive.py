@@ -0,0 +1,188 @@
+import asyncio, io, os, random, threading
+
+import aiohttp
+from google.auth.transport.requests import Request
+
+from services.pdf_source import PdfSource, download_path
+from utils.logger import logger
+
+DRIVE_API_URL = "https://www.googleapis.com/drive/v3"
+# Requests in flight at once over the shared connection pool
+ASYNC_DRIVE_CONCURRENCY = int(os.getenv("ASYNC_DRIVE_CONCURRENCY", "8"))
+ASYNC_DRIVE_RETRIES = int(os.getenv("ASYNC_DRIVE_RETRIES", "3"))
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class AsyncDriveError(Exception):
+    def __init__(self, status, message):
+        super().__init__(f"Drive API returned {status}: {message}")
+        self.status = status
+
+
+class AsyncDriveClient:
+    """
+    asyncio Drive v3 client over one pooled aiohttp session.
+
+    request_json covers the metadata calls (files.list, changes.list,
+    changes.getStartPageToken, changes.watch, channels.stop) and download
+    covers files.get_media. Unlike the httplib2-based googleapiclient, one
+    client can safely keep many requests in flight from a single event loop.
+    Use it as an async context manager.
+    """
+
+    def __init__(
+        self,
+        credentials,
+        max_concurrency=ASYNC_DRIVE_CONCURRENCY,
+        max_retries=ASYNC_DRIVE_RETRIES,
+        chunk_size=1024 * 1024,
+    ):
+        self.credentials = credentials
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.chunk_size = chunk_size
+        self._session = None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._token_lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.max_concurrency),
+            timeout=aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=120),
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._session.close()
+
+    async def _auth_headers(self):
+        # google-auth refreshes synchronously, so do it off the event loop
+        async with self._token_lock:
+            if not self.credentials.valid:
+                await asyncio.to_thread(self.credentials.refresh, Request())
+            return {"Authorization": f"Bearer {self.credentials.token}"}
+
+    async def _backoff(self, attempt, reason):
+        if attempt > self.max_retries:
+            return False
+        delay = 2**attempt + random.random()
+        logger.warning(f"Drive request failed ({reason}), retrying in {delay:.1f}s")
+        await asyncio.sleep(delay)
+        return True
+
+    async def request_json(self, method, path, params=None, body=None):
+        # One Drive v3 REST call with the same parameter names googleapiclient
+        # uses, retried on rate limits and transient errors
+        params = {
+            key: str(value).lower() if isinstance(value, bool) else value
+            for key, value in (params or {}).items()
+            if value is not None
+        }
+        attempt = 0
+        while True:
+            headers = await self._auth_headers()
+            async with self._semaphore:
+                try:
+                    async with self._session.request(
+                        method,
+                        f"{DRIVE_API_URL}/{path}",
+                        params=params,
+                        json=body,
+                        headers=headers,
+                    ) as response:
+                        if response.status < 300:
+                            if response.status == 204:
+                                return {}
+                            return await response.json()
+                        message = await response.text()
+                        if response.status not in RETRYABLE_STATUS_CODES:
+                            raise AsyncDriveError(response.status, message)
+                        reason = f"status {response.status}"
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    reason = str(e) or type(e).__name__
+            attempt += 1
+            if not await self._backoff(attempt, reason):
+                raise AsyncDriveError(None, reason)
+
+    async def _fetch_media(self, file_id, fh):
+        # Stream the file into fh; a failed attempt resumes from the bytes
+        # already written with a Range request
+        attempt = 0
+        while True:
+            headers = await self._auth_headers()
+            if fh.tell():
+                headers["Range"] = f"bytes={fh.tell()}-"
+            async with self._semaphore:
+                try:
+                    async with self._session.get(
+                        f"{DRIVE_API_URL}/files/{file_id}",
+                        params={"alt": "media"},
+                        headers=headers,
+                    ) as response:
+                        if response.status < 300:
+                            if fh.tell() and response.status != 206:
+                                # Server ignored the range; start over
+                                fh.seek(0)
+                                fh.truncate()
+                            async for chunk in response.content.iter_chunked(
+                                self.chunk_size
+                            ):
+                                fh.write(chunk)
+                            return fh.tell()
+                        message = await response.text()
+                        if response.status not in RETRYABLE_STATUS_CODES:
+                            raise AsyncDriveError(response.status, message)
+                        reason = f"status {response.status}"
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    reason = str(e) or type(e).__name__
+            attempt += 1
+            if not await self._backoff(attempt, reason):
+                raise AsyncDriveError(None, reason)
+
+    async def download(self, file, download_dir="tmp", in_memory_max_bytes=0):
+        # Download into memory or download_dir and return a PdfSource
+        size = file.get("size")
+        if size is not None and int(size) <= in_memory_max_bytes:
+            buffer = io.BytesIO()
+            await self._fetch_media(file["id"], buffer)
+            return PdfSource(file["name"], data=buffer.getvalue())
+
+        os.makedirs(download_dir, exist_ok=True)
+        file_path = download_path(download_dir, file)
+        with open(file_path, "wb") as fh:
+            await self._fetch_media(file["id"], fh)
+        return PdfSource(file["name"], path=file_path)
+
+
+class AsyncDriveRunner:
+    """
+    Synchronous front end to one AsyncDriveClient on a private event loop
+    thread, returned by google_services.create_drive_client when
+    DRIVE_API_BACKEND is "async".
+
+    Any thread may call request_json: every call runs on the same loop and
+    shares the client's connection pool and concurrency limit, instead of
+    several threads sharing one httplib2 connection.
+    """
+
+    def __init__(self, credentials, **client_kwargs):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="drive-api-async", daemon=True
+        )
+        self._thread.start()
+        self._client = AsyncDriveClient(credentials, **client_kwargs)
+        self._run(self._client.__aenter__())
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def request_json(self, method, path, params=None, body=None):
+        return self._run(self._client.request_json(method, path, params, body))
+
+    def close(self):
+        self._run(self._client.__aexit__(None, None, None))
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
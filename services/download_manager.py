@@ -0,0 +1,260 @@
+import asyncio
+import io
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import httplib2
+from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaIoBaseDownload
+
+from services.google_services import get_thread_local_service
+from services.async_drive import AsyncDriveClient
+from services.pdf_source import PdfSource, download_path
+from utils.logger import logger
+
+# Download tuning, overridable from the .env file
+DOWNLOAD_WORKERS = int(os.getenv("DOWNLOAD_WORKERS", "4"))
+DOWNLOAD_CHUNK_SIZE = int(os.getenv("DOWNLOAD_CHUNK_SIZE", str(32 * 1024 * 1024)))
+DOWNLOAD_RETRIES = int(os.getenv("DOWNLOAD_RETRIES", "3"))
+DOWNLOAD_DIR = "tmp"
+# PDFs up to this size are kept in memory instead of being written to DOWNLOAD_DIR;
+# set to 0 to always download to disk
+IN_MEMORY_MAX_BYTES = int(os.getenv("IN_MEMORY_MAX_BYTES", str(32 * 1024 * 1024)))
+# "threads" downloads on a thread pool with googleapiclient, "async" keeps every
+# download in flight on one event loop with AsyncDriveClient
+DOWNLOAD_BACKEND = os.getenv("DOWNLOAD_BACKEND", "threads")
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class DownloadManager:
+    """
+    Downloads Drive files on a bounded thread pool, or on a single event loop
+    with AsyncDriveClient when backend="async".
+
+    Each worker thread uses its own Drive service, chunks are fetched with a
+    configurable size and a failed chunk is retried from the last byte that was
+    written, so a dropped connection does not restart the whole file.
+    """
+
+    def __init__(
+        self,
+        credentials,
+        max_workers=DOWNLOAD_WORKERS,
+        chunk_size=DOWNLOAD_CHUNK_SIZE,
+        max_retries=DOWNLOAD_RETRIES,
+        download_dir=DOWNLOAD_DIR,
+        in_memory_max_bytes=IN_MEMORY_MAX_BYTES,
+        backend=DOWNLOAD_BACKEND,
+    ):
+        self.credentials = credentials
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        self.download_dir = download_dir
+        self.in_memory_max_bytes = in_memory_max_bytes
+        self.backend = backend
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="drive-download"
+        )
+        self._stats_lock = threading.Lock()
+        self._reset_stats()
+
+    def _reset_stats(self):
+        with self._stats_lock:
+            self.files_downloaded = 0
+            self.files_failed = 0
+            self.bytes_downloaded = 0
+            self.started_at = time.monotonic()
+
+    def _record(self, num_bytes=None):
+        with self._stats_lock:
+            if num_bytes is None:
+                self.files_failed += 1
+            else:
+                self.files_downloaded += 1
+                self.bytes_downloaded += num_bytes
+
+    def _next_chunk_with_retry(self, downloader, file_name):
+        attempt = 0
+        while True:
+            try:
+                return downloader.next_chunk()
+            except HttpError as error:
+                if error.resp.status not in RETRYABLE_STATUS_CODES:
+                    raise
+                last_error = error
+            except (OSError, httplib2.HttpLib2Error) as error:
+                last_error = error
+
+            attempt += 1
+            if attempt > self.max_retries:
+                raise last_error
+            # MediaIoBaseDownload only advances its offset after a chunk has been
+            # written, so calling next_chunk again resumes with a Range request
+            delay = 2**attempt
+            logger.warning(
+                f"Chunk download for {file_name} failed ({last_error}), "
+                f"retrying in {delay}s (attempt {attempt}/{self.max_retries})"
+            )
+            time.sleep(delay)
+
+    def _keep_in_memory(self, file):
+        # Drive reports the size up front; files of unknown size go to disk
+        size = file.get("size")
+        return size is not None and int(size) <= self.in_memory_max_bytes
+
+    def _fetch(self, file, fh):
+        drive_service = get_thread_local_service(self.credentials, "drive", "v3")
+        request = drive_service.files().get_media(fileId=file["id"])
+        downloader = MediaIoBaseDownload(fh, request, chunksize=self.chunk_size)
+        done = False
+        while not done:
+            status, done = self._next_chunk_with_retry(downloader, file["name"])
+        return fh.tell()
+
+    def download(self, file):
+        # Download a single file from Drive metadata, returning a PdfSource
+        file_name = file["name"]
+        try:
+            if self._keep_in_memory(file):
+                buffer = io.BytesIO()
+                num_bytes = self._fetch(file, buffer)
+                pdf_source = PdfSource(file_name, data=buffer.getvalue())
+                logger.info(f"File {file_name} downloaded into memory.")
+            else:
+                os.makedirs(self.download_dir, exist_ok=True)
+                file_path = download_path(self.download_dir, file)
+                with io.FileIO(file_path, "wb") as fh:
+                    num_bytes = self._fetch(file, fh)
+                pdf_source = PdfSource(file_name, path=file_path)
+                logger.info(f"File {file_name} downloaded to {file_path}.")
+
+            self._record(num_bytes)
+            return pdf_source
+        except HttpError as error:
+            logger.error(f"An error occurred while downloading {file_name}: {error}")
+        except Exception as e:
+            logger.error(f"Unexpected error while downloading {file_name}: {e}")
+        self._record()
+        return None
+
+    def download_many(self, files, on_failure=None):
+        # Yield (file, pdf_source) pairs as downloads complete. At most twice the
+        # worker count is in flight, so 'files' can be a lazy generator. Files
+        # that fail to download are passed to on_failure instead.
+        files = iter(files)
+        self._reset_stats()
+        if self.backend == "async":
+            yield from self._download_many_async(files, on_failure)
+            self.log_throughput()
+            return
+
+        pending = {}
+
+        def submit_next():
+            file = next(files, None)
+            if file is None:
+                return False
+            pending[self._executor.submit(self.download, file)] = file
+            return True
+
+        for _ in range(self.max_workers * 2):
+            if not submit_next():
+                break
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                file = pending.pop(future)
+                submit_next()
+                pdf_source = future.result()
+                if pdf_source:
+                    yield file, pdf_source
+                elif on_failure:
+                    on_failure(file)
+
+        self.log_throughput()
+
+    def _download_many_async(self, files, on_failure):
+        # A single event loop thread keeps every download in flight over one
+        # pooled session and hands results back through a bounded queue
+        results = queue.Queue(maxsize=self.max_workers * 2)
+        finished = object()
+        # An error from 'files' itself, e.g. a failed Drive listing, stops the
+        # loop and is re-raised to the caller rather than ending the listing early
+        loop_errors = []
+
+        async def fetch(client, file):
+            try:
+                pdf_source = await client.download(
+                    file, self.download_dir, self.in_memory_max_bytes
+                )
+                self._record(pdf_source.size)
+                logger.info(f"File {file['name']} downloaded to {pdf_source}.")
+            except Exception as e:
+                logger.error(f"Error while downloading {file['name']}: {e}")
+                self._record()
+                pdf_source = None
+            await asyncio.to_thread(results.put, (file, pdf_source))
+
+        async def run():
+            async with AsyncDriveClient(
+                self.credentials,
+                max_concurrency=self.max_workers,
+                max_retries=self.max_retries,
+                chunk_size=self.chunk_size,
+            ) as client:
+                tasks = set()
+                while True:
+                    # 'files' may be a lazy generator that calls the Drive API
+                    file = await asyncio.to_thread(next, files, None)
+                    if file is None:
+                        break
+                    if len(tasks) >= self.max_workers * 2:
+                        _, tasks = await asyncio.wait(
+                            tasks, return_when=asyncio.FIRST_COMPLETED
+                        )
+                    tasks.add(asyncio.create_task(fetch(client, file)))
+                if tasks:
+                    await asyncio.wait(tasks)
+
+        def run_loop():
+            try:
+                asyncio.run(run())
+            except Exception as e:
+                logger.error(f"Async download loop failed: {e}")
+                loop_errors.append(e)
+            finally:
+                results.put(finished)
+
+        threading.Thread(target=run_loop, name="drive-download-async", daemon=True).start()
+        while True:
+            item = results.get()
+            if item is finished:
+                break
+            file, pdf_source = item
+            if pdf_source:
+                yield file, pdf_source
+            elif on_failure:
+                on_failure(file)
+        if loop_errors:
+            raise loop_errors[0]
+
+    def log_throughput(self):
+        with self._stats_lock:
+            elapsed = max(time.monotonic() - self.started_at, 1e-6)
+            megabytes = self.bytes_downloaded / (1024 * 1024)
+            files_downloaded = self.files_downloaded
+            files_failed = self.files_failed
+        if files_downloaded or files_failed:
+            logger.info(
+                f"Downloaded {files_downloaded} files ({megabytes:.1f} MB) in "
+                f"{elapsed:.1f}s, {megabytes / elapsed:.2f} MB/s; {files_failed} failed."
+            )
+
+    def close(self):
+        self._executor.shutdown(wait=True)
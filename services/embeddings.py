@@ -0,0 +1,180 @@
+import os, threading, time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import openai
+from langchain_core.embeddings import Embeddings
+
+from utils.embedding_cache import EmbeddingCache, text_hash
+from utils.logger import logger
+from utils.tokens import count_tokens
+
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+# Shortened text-embedding-3 vectors via the API's dimensions parameter;
+# unset or 0 keeps the model's full 3072 dimensions
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "0")) or None
+
+# Chunks are packed into embedding requests of at most this many tokens and
+# inputs, and up to EMBED_CONCURRENCY requests are in flight at once
+EMBED_REQUEST_MAX_TOKENS = int(os.getenv("EMBED_REQUEST_MAX_TOKENS", "50000"))
+EMBED_REQUEST_MAX_INPUTS = int(os.getenv("EMBED_REQUEST_MAX_INPUTS", "512"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+EMBED_RETRIES = int(os.getenv("EMBED_RETRIES", "5"))
+
+RETRYABLE_EMBEDDING_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+_embedding_cache = None
+_embedding_cache_lock = threading.Lock()
+
+
+def get_embedding_cache():
+    # One SQLite connection shared by every document worker in the process
+    global _embedding_cache
+    with _embedding_cache_lock:
+        if _embedding_cache is None:
+            _embedding_cache = EmbeddingCache()
+        return _embedding_cache
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Sits in front of an embeddings client and only sends texts the on-disk
+    cache has never seen. Keeps hit counts and the tokens saved, for
+    log_stats() once a document is done.
+    """
+
+    def __init__(self, embeddings, cache=None):
+        self.embeddings = embeddings
+        self.cache = cache or get_embedding_cache()
+        self.model = getattr(embeddings, "model", type(embeddings).__name__)
+        self.dimensions = getattr(embeddings, "dimensions", None)
+        self.hits = 0
+        self.misses = 0
+        self.saved_tokens = 0
+
+    def embed_documents(self, texts):
+        hashes = [text_hash(text) for text in texts]
+        vectors = self.cache.get_many(self.model, self.dimensions, hashes)
+
+        # Each distinct unseen text goes to the API once
+        missing = {}
+        for hash_, text in zip(hashes, texts):
+            if hash_ not in vectors:
+                missing.setdefault(hash_, text)
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        self.saved_tokens += sum(
+            count_tokens(text) for hash_, text in zip(hashes, texts) if hash_ in vectors
+        )
+
+        if missing:
+            new_vectors = self.embeddings.embed_documents(list(missing.values()))
+            items = list(zip(missing, new_vectors))
+            self.cache.put_many(self.model, self.dimensions, items)
+            vectors.update(items)
+        return [np.asarray(vectors[hash_], dtype=float).tolist() for hash_ in hashes]
+
+    def embed_query(self, text):
+        # Section prompts repeat for every document, so queries are cached too
+        return self.embed_documents([text])[0]
+
+    def log_stats(self, label):
+        total = self.hits + self.misses
+        if not total:
+            return
+        logger.info(
+            f"Embedding cache for {label}: {self.hits}/{total} hits "
+            f"({100 * self.hits / total:.1f}%), {self.saved_tokens} tokens saved."
+        )
+
+
+def pack_batches(texts, max_tokens=EMBED_REQUEST_MAX_TOKENS, max_inputs=EMBED_REQUEST_MAX_INPUTS):
+    # Groups text indexes into request batches under both limits, in order
+    batches, batch, batch_tokens = [], [], 0
+    for index, text in enumerate(texts):
+        tokens = count_tokens(text)
+        if batch and (batch_tokens + tokens > max_tokens or len(batch) >= max_inputs):
+            batches.append(batch)
+            batch, batch_tokens = [], 0
+        batch.append(index)
+        batch_tokens += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class BatchedEmbeddings(Embeddings):
+    """
+    Sends a list of texts as token-budgeted requests on a bounded thread
+    pool instead of one request after another. Rate limits and transient
+    API errors are retried with exponential backoff, honouring Retry-After.
+    """
+
+    def __init__(self, embeddings, concurrency=EMBED_CONCURRENCY, max_retries=EMBED_RETRIES):
+        self.embeddings = embeddings
+        self.model = getattr(embeddings, "model", type(embeddings).__name__)
+        self.dimensions = getattr(embeddings, "dimensions", None)
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+
+    def _embed_with_retry(self, texts):
+        attempt = 0
+        while True:
+            try:
+                return self.embeddings.embed_documents(texts)
+            except RETRYABLE_EMBEDDING_ERRORS as error:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                delay = 2**attempt
+                response = getattr(error, "response", None)
+                retry_after = response.headers.get("retry-after") if response is not None else None
+                if retry_after:
+                    try:
+                        delay = max(float(retry_after), 1)
+                    except ValueError:
+                        pass
+                logger.warning(
+                    f"Embedding request for {len(texts)} texts failed ({error}), "
+                    f"retrying in {delay}s (attempt {attempt}/{self.max_retries})"
+                )
+                time.sleep(delay)
+
+    def embed_documents(self, texts):
+        batches = pack_batches(texts)
+        if len(batches) <= 1:
+            return self._embed_with_retry(list(texts)) if texts else []
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(batches))) as executor:
+            results = list(
+                executor.map(
+                    lambda batch: self._embed_with_retry([texts[index] for index in batch]),
+                    batches,
+                )
+            )
+        vectors = [None] * len(texts)
+        for batch, batch_vectors in zip(batches, results):
+            for index, vector in zip(batch, batch_vectors):
+                vectors[index] = vector
+        logger.info(
+            f"Embedded {len(texts)} texts in {len(batches)} requests "
+            f"in {time.perf_counter() - started:.2f}s"
+        )
+        return vectors
+
+    def embed_query(self, text):
+        return self._embed_with_retry([text])[0]
+
+
+def create_embeddings(embeddings):
+    # Batched parallel requests, behind the persistent cache unless it is disabled
+    embeddings = BatchedEmbeddings(embeddings)
+    if not EMBEDDING_CACHE_ENABLED:
+        return embeddings
+    return CachedEmbeddings(embeddings)
@@ -1,10 +1,21 @@
 import os
+import threading
 from google.oauth2 import service_account
+from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-import io
-from googleapiclient.http import MediaIoBaseDownload
+from services.async_drive import AsyncDriveError, AsyncDriveRunner
 from utils.logger import logger
 
+# googleapiclient service objects wrap a single httplib2 connection and are not
+# thread-safe, so worker threads each get their own copy
+_thread_local = threading.local()
+
+# "sync" sends listing, change polling and watch calls through googleapiclient,
+# "async" through one pooled AsyncDriveClient that any thread can share
+DRIVE_API_BACKEND = os.getenv("DRIVE_API_BACKEND", "sync")
+# Errors either Drive client raises for a failed call
+DRIVE_API_ERRORS = (HttpError, AsyncDriveError)
+
 
 def load_service_account_credentials(service_account_file, scopes):
     try:
@@ -18,67 +29,138 @@ def load_service_account_credentials(service_account_file, scopes):
         raise
 
 
-def download_pdf_from_drive(drive_service, file_id, file_name):
-    try:
-        # Create the tmp directory if it doesn't exist
-        if not os.path.exists("tmp"):
-            os.makedirs("tmp")
-
-        # File path where the PDF will be saved
-        file_path = os.path.join("tmp", file_name)
-
-        request = drive_service.files().get_media(fileId=file_id)
-        fh = io.FileIO(file_path, "wb")
-        downloader = MediaIoBaseDownload(fh, request)
-        done = False
-        while not done:
-            status, done = downloader.next_chunk()
-            logger.info(f"Download {int(status.progress() * 100)}%.")
-
-        logger.info(f"File {file_name} downloaded to {file_path}.")
-        return file_path
-    except HttpError as error:
-        logger.error(f"An error occurred while downloading the file: {error}")
-    except Exception as e:
-        logger.error(f"Unexpected error: {e}")
+def get_thread_local_service(credentials, api, version):
+    services = getattr(_thread_local, "services", None)
+    if services is None:
+        services = _thread_local.services = {}
+    service = services.get((api, version))
+    if service is None:
+        service = build(api, version, credentials=credentials, cache_discovery=False)
+        services[(api, version)] = service
+    return service
+
+
+def create_drive_client(credentials, backend=DRIVE_API_BACKEND):
+    # The client passed as drive_service to the listing, change and watch calls
+    if backend == "sync":
+        return build("drive", "v3", credentials=credentials)
+    if backend == "async":
+        return AsyncDriveRunner(credentials)
+    raise ValueError(f"Unknown Drive API backend {backend!r}; expected 'sync' or 'async'")
 
 
-def list_files_in_drive(drive_service, folder_id):
-    file_data = []
+# Only request the metadata fields the pipeline actually uses
+DRIVE_FILE_FIELDS = "id, name, size, md5Checksum, modifiedTime"
+
+
+def list_files_in_drive(drive_service, folder_id, page_size=1000):
+    # Yield lightweight metadata for the PDFs in the folder, one page at a time.
+    # Nothing is downloaded here, and callers can start on the first page while
+    # later pages are still being fetched. A failed page is logged and re-raised,
+    # so callers never mistake a truncated listing for a complete one.
+    page_token = None
+    total = 0
     try:
-        results = (
-            drive_service.files()
-            .list(
-                q=f"'{folder_id}' in parents",
-                pageSize=1000,  # Increase pageSize if needed
-                fields="files(id, name, mimeType)",
-            )
-            .execute()
-        )
-        files = results.get("files", [])
+        while True:
+            params = {
+                "q": f"'{folder_id}' in parents and mimeType='application/pdf' and trashed=false",
+                "pageSize": page_size,
+                "pageToken": page_token,
+                "fields": f"nextPageToken, files({DRIVE_FILE_FIELDS})",
+            }
+            if isinstance(drive_service, AsyncDriveRunner):
+                results = drive_service.request_json("GET", "files", params)
+            else:
+                results = drive_service.files().list(**params).execute()
+            files = results.get("files", [])
+            total += len(files)
+            logger.debug(f"Fetched a page of {len(files)} files from Drive.")
+            for file in files:
+                yield file
+
+            page_token = results.get("nextPageToken")
+            if not page_token:
+                break
 
-        if not files:
+        if total == 0:
             logger.info("No files found in the specified folder.")
         else:
-            logger.info(f"Found {len(files)} files in the folder.")
-            for file in files:
-                logger.info(f'{file["name"]} ({file["id"]})')
-
-                # Check if the file is a PDF
-                if file["mimeType"] == "application/pdf":
-                    logger.info(f"Downloading PDF file: {file['name']}")
-                    file_path = download_pdf_from_drive(
-                        drive_service, file["id"], file["name"]
-                    )
-                    if file_path:
-                        # Return file ID, name, and path
-                        file_data.append((file["id"], file["name"], file_path))
-    except HttpError as error:
-        logger.error(f"An error occurred while listing files in Drive: {error}")
+            logger.info(f"Found {total} PDF files in the folder.")
+    except DRIVE_API_ERRORS as error:
+        logger.error(
+            f"Listing files in Drive stopped after {total} files: {error}"
+        )
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error after listing {total} files: {e}")
+        raise
+
+
+def get_start_page_token(drive_service):
+    if isinstance(drive_service, AsyncDriveRunner):
+        response = drive_service.request_json("GET", "changes/startPageToken")
+    else:
+        response = drive_service.changes().getStartPageToken().execute()
+    return response.get("startPageToken")
+
+
+def list_changed_pdfs(drive_service, page_token, folder_id):
+    # Follow the changes feed from page_token and return the PDFs added to or
+    # modified in the folder, plus the token to resume from next time. An idle
+    # feed costs a single small request.
+    changed_files = []
+    try:
+        while page_token is not None:
+            params = {
+                "pageToken": page_token,
+                "spaces": "drive",
+                "includeRemoved": False,
+                "fields": f"nextPageToken, newStartPageToken, changes(fileId, file({DRIVE_FILE_FIELDS}, parents, mimeType, trashed))",
+            }
+            if isinstance(drive_service, AsyncDriveRunner):
+                response = drive_service.request_json("GET", "changes", params)
+            else:
+                response = drive_service.changes().list(**params).execute()
+
+            for change in response.get("changes", []):
+                file = change.get("file")
+                if (
+                    file
+                    and file.get("mimeType") == "application/pdf"
+                    and not file.get("trashed")
+                    and folder_id in file.get("parents", [])
+                ):
+                    changed_files.append(file)
+
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                return changed_files, response.get("newStartPageToken")
+    except DRIVE_API_ERRORS as error:
+        logger.error(f"An error occurred while listing Drive changes: {error}")
     except Exception as e:
         logger.error(f"Unexpected error: {e}")
+    return changed_files, None
+
+
+def watch_changes(drive_service, page_token, channel):
+    # Starts push notifications for the changes feed from page_token
+    if isinstance(drive_service, AsyncDriveRunner):
+        return drive_service.request_json(
+            "POST", "changes/watch", {"pageToken": page_token, "fields": "*"}, channel
+        )
+    return (
+        drive_service.changes()
+        .watch(body=channel, pageToken=page_token, fields="*")
+        .execute()
+    )
+
 
-    return file_data
+def stop_channel(drive_service, channel_id, resource_id):
+    body = {"id": channel_id, "resourceId": resource_id}
+    if isinstance(drive_service, AsyncDriveRunner):
+        drive_service.request_json("POST", "channels/stop", body=body)
+    else:
+        drive_service.channels().stop(body=body).execute()
 
 
 def append_to_google_sheets(sheets_service, spreadsheet_id, range_name, values):
@@ -98,12 +180,14 @@ def append_to_google_sheets(sheets_service, spreadsheet_id, range_name, values):
         logger.info(
             f'{result.get("updates").get("updatedCells")} cells appended to Google Sheets.'
         )
+        return True
     except HttpError as error:
         logger.error(
             f"An error occurred while appending data to Google Sheets: {error}"
         )
     except Exception as e:
         logger.error(f"Unexpected error: {e}")
+    return False
 
 
 def delete_last_row(sheets_service, spreadsheet_id, sheet_name):
@@ -1,11 +1,14 @@
 from utils.logger import logger
-import pymupdf
 import re
 import json
 from unidecode import unidecode
+from services.pdf_document import ParsedDocument
+from services.pdf_source import as_pdf_source
 
 
-def highlight_text_in_pdf(pdf_path, extracted_data, output_pdf_path):
+def highlight_text_in_pdf(pdf_source, extracted_data, output_pdf_path):
+    # pdf_source may be a ParsedDocument, whose open PyMuPDF handle is reused
+    # and left open for its owner to close, or a PdfSource / file path
 
     def normalize_text(text):
         # Minimal normalization to match the PDF content
@@ -25,10 +28,14 @@ def highlight_text_in_pdf(pdf_path, extracted_data, output_pdf_path):
     # Define words to exclude from highlighting
     exclude_words = {"no", "yes", "n/a", "0"}
 
+    owns_doc = not isinstance(pdf_source, ParsedDocument)
     try:
-        doc = pymupdf.open(pdf_path)
+        if owns_doc:
+            doc = as_pdf_source(pdf_source).open_document()
+        else:
+            doc = pdf_source.handle
     except Exception as e:
-        logger.error(f"Failed to open PDF file {pdf_path}: {e}")
+        logger.error(f"Failed to open PDF file {pdf_source}: {e}")
         return
 
     try:
@@ -253,6 +260,7 @@ def highlight_text_in_pdf(pdf_path, extracted_data, output_pdf_path):
     finally:
         try:
             doc.save(output_pdf_path, garbage=4, deflate=True)
-            doc.close()
+            if owns_doc:
+                doc.close()
         except Exception as e:
             logger.error(f"Failed to save or close the PDF document: {e}")
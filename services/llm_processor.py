@@ -1,7 +1,6 @@
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_chroma import Chroma
+import os
+
 from langchain_openai import OpenAIEmbeddings
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain.chains import create_history_aware_retriever, create_retrieval_chain
 from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
@@ -17,142 +16,337 @@ from utils.prompts import (
     track_record_prompt,
     use_of_proceeds_prompt,
 )
+from services.embeddings import EMBEDDING_DIMENSIONS, CachedEmbeddings, create_embeddings
 from services.highlighting import highlight_text_in_pdf
+from services.pdf_document import load_parsed_document
+from services.pdf_text_backends import PDF_TEXT_BACKEND, parser_version
+from services.section_routing import (
+    ROUTE_MAX_PAGES,
+    SECTION_ROUTING_ENABLED,
+    route_sections,
+)
+from services.table_extraction import (
+    TABLE_CODE_VERSION,
+    TABLE_EXTRACTION_ENABLED,
+    TABLE_MAX_CANDIDATE_PAGES,
+    extract_table_sections,
+)
+from services.text_filters import (
+    BOILERPLATE_FILTER_ENABLED,
+    BOILERPLATE_SECTIONS,
+    HEADER_FOOTER_STRIP_ENABLED,
+    REPEATED_LINE_EDGE_LINES,
+    REPEATED_LINE_MIN_FRACTION,
+    apply_boilerplate_filter,
+    apply_header_footer_strip,
+)
+from services.token_splitter import (
+    TEXT_SPLITTER,
+    TOKEN_CHUNK_OVERLAP,
+    TOKEN_CHUNK_SIZE,
+    create_text_splitter,
+)
+from services.vector_index import (
+    VECTOR_DTYPE,
+    VECTOR_STORE,
+    NumpyVectorStore,
+    create_vector_store,
+    index_key,
+)
+from utils.checkpoints import load_checkpoint, save_checkpoint
+from utils.tokens import EMBEDDING_MODEL
 
 load_dotenv()
 
 
+# Chunks are embedded and added to the vector store this many at a time, so
+# only one batch of chunk text and vectors is held in memory. Each batch is
+# sent as several parallel embedding requests.
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "1024"))
+# Chunks retrieved per section query. 4 matches what the original
+# as_retriever(k=15) actually returned, since LangChain ignores a bare k;
+# raising it adds context tokens to every section call.
+RETRIEVER_K = int(os.getenv("RETRIEVER_K", "4"))
+
+# Chat model that answers the section prompts
+EXTRACTION_MODEL = "gpt-4o-mini"
+
+CONTEXTUALIZE_Q_SYSTEM_PROMPT = """
+    Given the task of analyzing and extracting data from Private Placement Memorandum (PPM) documents, you will be provided with a chat history and the latest user question that may reference prior context. Your role is to reformulate the user's question into a standalone version that can be understood without relying on previous chat history or prior exchanges. Do NOT answer the question; only rephrase or return it as-is, ensuring it is clear and self-contained. Maintain the accuracy and integrity of the original query's intent.
+    """
+
+
+def iter_chunks(pages, text_splitter):
+    # Splits one page at a time instead of materialising every chunk up front
+    for page in pages:
+        yield from text_splitter.split_documents([page])
+
+
+def iter_batches(items, batch_size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def chunk_settings():
+    # Everything besides the PDF itself that decides a document's chunks
+    return {
+        "parser": parser_version(PDF_TEXT_BACKEND),
+        "header_footer": [
+            HEADER_FOOTER_STRIP_ENABLED,
+            REPEATED_LINE_MIN_FRACTION,
+            REPEATED_LINE_EDGE_LINES,
+        ],
+        "boilerplate": BOILERPLATE_SECTIONS if BOILERPLATE_FILTER_ENABLED else [],
+        "splitter": [TEXT_SPLITTER, TOKEN_CHUNK_SIZE, TOKEN_CHUNK_OVERLAP],
+    }
+
+
+def vector_index_settings(embeddings):
+    # Everything besides the PDF itself that decides a document's chunks and vectors
+    return {
+        **chunk_settings(),
+        "model": embeddings.model,
+        "dimensions": embeddings.dimensions,
+        "dtype": VECTOR_DTYPE,
+    }
+
+
+def extraction_settings():
+    # Everything besides the PDF and its Deal_ID that decides the extracted
+    # answers, so a prompt, model or extraction change never reuses old results
+    return {
+        **chunk_settings(),
+        "embeddings": [EMBEDDING_MODEL, EMBEDDING_DIMENSIONS],
+        "vector_store": [VECTOR_STORE, VECTOR_DTYPE],
+        "retriever_k": RETRIEVER_K,
+        "llm": EXTRACTION_MODEL,
+        "prompts": [
+            system_prompt(deal_id="{deal_id}", first_few_pages_text="{pages}"),
+            CONTEXTUALIZE_Q_SYSTEM_PROMPT,
+            leadership_prompt,
+            compensation_prompt,
+            track_record_prompt,
+            projected_results_prompt(last_10_pages_text="{pages}"),
+            use_of_proceeds_prompt,
+            final_data_table_prompt,
+        ],
+        "tables": [TABLE_EXTRACTION_ENABLED, TABLE_MAX_CANDIDATE_PAGES, TABLE_CODE_VERSION],
+        "routing": [SECTION_ROUTING_ENABLED, ROUTE_MAX_PAGES],
+    }
+
+
 # Process the PDF and create the vector store
-def process_pdf_file(pdf_path):
+def process_pdf_file(document, content_hash=None):
     try:
-        # Load the PDF document using PyPDFLoader
-        loader = PyPDFLoader(pdf_path)
-        documents = loader.load()
+        # Chunks embedded by any earlier run are served from the on-disk cache
+        # Retries are handled per request batch by BatchedEmbeddings
+        embeddings = create_embeddings(
+            OpenAIEmbeddings(
+                model=EMBEDDING_MODEL,
+                dimensions=EMBEDDING_DIMENSIONS,
+                max_retries=0,
+            )
+        )
+
+        # A document indexed before is reopened from disk instead of rebuilt
+        key = None
+        if VECTOR_STORE == "numpy":
+            key = index_key(content_hash, vector_index_settings(embeddings))
+            vector_store = NumpyVectorStore.load(key, embeddings)
+            if vector_store is not None:
+                return vector_store
+
+        # Pages come from the shared ParsedDocument, so nothing is parsed here
+        documents = document.pages
 
         # Split the document into chunks for the vector store
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=2000, chunk_overlap=200
-        )
-        splits = text_splitter.split_documents(documents)
+        text_splitter = create_text_splitter()
+        # Legal boilerplate is dropped so it is never embedded or retrieved
+        documents = apply_boilerplate_filter(documents, text_splitter)
 
-        # Create embeddings and vector store
-        embeddings = OpenAIEmbeddings(model="text-embedding-3-large")
-        vector_store = Chroma.from_documents(documents=splits, embedding=embeddings)
+        vector_store = create_vector_store(embeddings)
 
+        # Chunks are produced lazily and embedded and inserted batch by batch
+        num_chunks = 0
+        for batch in iter_batches(iter_chunks(documents, text_splitter), EMBED_BATCH_SIZE):
+            vector_store.add_documents(batch)
+            num_chunks += len(batch)
+
+        if isinstance(embeddings, CachedEmbeddings):
+            embeddings.log_stats(document.source)
+        logger.info(f"Added {num_chunks} chunks from {document.source} to the vector store.")
+        if key:
+            vector_store.save(key)
         return vector_store
 
     except Exception as e:
-        logger.error(f"Failed to process PDF file {pdf_path}: {e}")
+        logger.error(f"Failed to process PDF file {document.source}: {e}")
         return None
 
 
-def extract_data_from_pdf(pdf_file_path, deal_id):
+def build_rag_chain(vector_store, deal_id, first_few_pages_text, pages=None):
+    # Create the retriever from the vector store, limited to the routed pages
+    # of the section when there are any. Routing only narrows the pages
+    # searched; routed and unrouted sections retrieve the same number of chunks.
+    search_kwargs = {"k": RETRIEVER_K}
+    if pages:
+        search_kwargs["filter"] = {"page": {"$in": pages}}
+    retriever = vector_store.as_retriever(search_kwargs=search_kwargs)
+
+    prompt = ChatPromptTemplate.from_messages(
+        [
+            (
+                "system",
+                system_prompt(
+                    deal_id=deal_id, first_few_pages_text=first_few_pages_text
+                ),
+            ),
+            MessagesPlaceholder(variable_name="chat_history"),
+            ("human", "{input}"),
+        ]
+    )
+
+    # Initialize the LLM and memory
+    llm = ChatOpenAI(model=EXTRACTION_MODEL)
+
+    contextualize_q_prompt = ChatPromptTemplate.from_messages(
+        [
+            ("system", CONTEXTUALIZE_Q_SYSTEM_PROMPT),
+            MessagesPlaceholder("chat_history"),
+            ("human", "{input}"),
+        ]
+    )
+    history_aware_retriever = create_history_aware_retriever(
+        llm, retriever, contextualize_q_prompt
+    )
+
+    question_answer_chain = create_stuff_documents_chain(llm, prompt)
+
+    return create_retrieval_chain(history_aware_retriever, question_answer_chain)
+
+
+def extract_data_from_pdf(pdf_source, deal_id, content_hash=None):
+    document = None
     try:
-        vector_store = process_pdf_file(pdf_file_path)
-        if vector_store:
-            # Create the retriever from the vector store
-            retriever = vector_store.as_retriever(k=15)
-
-            loader = PyPDFLoader(pdf_file_path)
-            documents = loader.load()
-            first_few_pages = documents[:20]
-            first_few_pages_text = "\n\n".join(
-                [
-                    doc.page_content.replace("{", "{{").replace("}", "}}")
-                    for doc in first_few_pages
-                ]
-            )
+        # Parse once; chunking, prompt windows and highlighting all share it
+        document = load_parsed_document(pdf_source, content_hash)
+        # Running headers and footers would otherwise be repeated in every chunk
+        # and in the 20-page system prompt
+        document.pages = apply_header_footer_strip(document.pages)
+        documents = document.pages
+        first_few_pages = documents[:20]
+        first_few_pages_text = "\n\n".join(
+            [
+                doc.page_content.replace("{", "{{").replace("}", "}}")
+                for doc in first_few_pages
+            ]
+        )
+        # Page ranges for each section from the outline or table of contents
+        section_pages = route_sections(document)
+        # The projections are usually at the end; use their routed pages if known
+        if "Projected Results" in section_pages:
+            last_10_pages = [documents[page] for page in section_pages["Projected Results"][:10]]
+        else:
             last_10_pages = documents[-10:]
-            last_10_pages_text = "\n\n".join(
-                [
-                    doc.page_content.replace("{", "{{").replace("}", "}}")
-                    for doc in last_10_pages
-                ]
-            )
-
-            prompt = ChatPromptTemplate.from_messages(
-                [
-                    (
-                        "system",
-                        system_prompt(
-                            deal_id=deal_id, first_few_pages_text=first_few_pages_text
-                        ),
-                    ),
-                    MessagesPlaceholder(variable_name="chat_history"),
-                    ("human", "{input}"),
-                ]
-            )
+        last_10_pages_text = "\n\n".join(
+            [
+                doc.page_content.replace("{", "{{").replace("}", "}}")
+                for doc in last_10_pages
+            ]
+        )
 
-            # Initialize the LLM and memory
-            llm = ChatOpenAI(model="gpt-4o-mini")
+        # Define your prompts for each section
+        section_prompts = {
+            "Leadership": leadership_prompt,
+            "Compensation": compensation_prompt,
+            "Track Record": track_record_prompt,
+            "Projected Results": projected_results_prompt(
+                last_10_pages_text=last_10_pages_text
+            ),
+            "Use of Proceeds": use_of_proceeds_prompt,
+            "Final Data Table": final_data_table_prompt,
+        }
 
-            contextualize_q_system_prompt = """
-            Given the task of analyzing and extracting data from Private Placement Memorandum (PPM) documents, you will be provided with a chat history and the latest user question that may reference prior context. Your role is to reformulate the user's question into a standalone version that can be understood without relying on previous chat history or prior exchanges. Do NOT answer the question; only rephrase or return it as-is, ensuring it is clear and self-contained. Maintain the accuracy and integrity of the original query's intent.
-            """
+        # Section answers already paid for by an earlier, interrupted attempt
+        extracted_data = load_checkpoint(content_hash, "sections") or {}
 
-            contextualize_q_prompt = ChatPromptTemplate.from_messages(
-                [
-                    ("system", contextualize_q_system_prompt),
-                    MessagesPlaceholder("chat_history"),
-                    ("human", "{input}"),
-                ]
-            )
-            history_aware_retriever = create_history_aware_retriever(
-                llm, retriever, contextualize_q_prompt
-            )
+        # Tabular sections are read straight from the PDF tables when possible;
+        # the LLM only answers them when no table is detected
+        table_sections = {
+            section
+            for section in ("Use of Proceeds", "Projected Results")
+            if section not in extracted_data
+        }
+        if table_sections:
+            for section, data in extract_table_sections(document, deal_id).items():
+                if section in table_sections:
+                    extracted_data[section] = data
+            save_checkpoint(content_hash, "sections", extracted_data)
 
-            question_answer_chain = create_stuff_documents_chain(llm, prompt)
+        pending_sections = [
+            section for section in section_prompts if section not in extracted_data
+        ]
 
-            rag_chain = create_retrieval_chain(
-                history_aware_retriever, question_answer_chain
-            )
+        if pending_sections:
+            vector_store = process_pdf_file(document, content_hash)
+            if not vector_store:
+                logger.error("Failed to create the vector store from the PDF.")
+                return None
 
-            # Define your prompts for each section
-            section_prompts = {
-                "Leadership": leadership_prompt,
-                "Compensation": compensation_prompt,
-                "Track Record": track_record_prompt,
-                "Projected Results": projected_results_prompt(
-                    last_10_pages_text=last_10_pages_text
-                ),
-                "Use of Proceeds": use_of_proceeds_prompt,
-                "Final Data Table": final_data_table_prompt,
-            }
+            rag_chain = build_rag_chain(vector_store, deal_id, first_few_pages_text)
 
             # Extract data for each section in a conversational manner
-            extracted_data = {}
-            for section, prompt_text in section_prompts.items():
+            for section in pending_sections:
+                section_chain = rag_chain
+                if section in section_pages:
+                    section_chain = build_rag_chain(
+                        vector_store, deal_id, first_few_pages_text, section_pages[section]
+                    )
                 # Here we pass input as a dict as expected by the RAG chain
                 input_dict = {
-                    "input": prompt_text,
+                    "input": section_prompts[section],
                     "chat_history": [],
                 }
-                response = rag_chain.invoke(input_dict)
+                response = section_chain.invoke(input_dict)
                 # Extract only the answer part
                 extracted_data[section] = response.get(
                     "answer", "No relevant data found."
                 )
-
-            # Highlight text in the PDF according to extracted data
-            output_pdf_path = f"{pdf_file_path}_highlighted.pdf"
-            highlight_text_in_pdf(pdf_file_path, extracted_data, output_pdf_path)
-
-            # Save the extracted data to a .txt file
-            with open(f"{pdf_file_path}_data.txt", "w") as f:
-                for section, content in extracted_data.items():
-                    f.write(f"{section}:\n")
-                    if isinstance(content, list):
-                        for entry in content:
-                            f.write(f"{entry}\n")
-                    else:
-                        f.write(f"{content}\n")
-                    f.write("\n")
+                save_checkpoint(content_hash, "sections", extracted_data)
 
             vector_store.delete_collection()
-            logger.info("All sections have been successfully processed.")
-            return extracted_data
         else:
-            logger.error("Failed to create the vector store from the PDF.")
+            logger.info("Reusing checkpointed answers for all sections.")
+
+        # Keep the section order stable regardless of which attempt answered it
+        extracted_data = {section: extracted_data[section] for section in section_prompts}
+
+        # Highlight text in the PDF according to extracted data
+        output_pdf_path = document.source.output_path("_highlighted.pdf")
+        highlight_text_in_pdf(document, extracted_data, output_pdf_path)
+
+        # Save the extracted data to a .txt file
+        with open(document.source.output_path("_data.txt"), "w") as f:
+            for section, content in extracted_data.items():
+                f.write(f"{section}:\n")
+                if isinstance(content, list):
+                    for entry in content:
+                        f.write(f"{entry}\n")
+                else:
+                    f.write(f"{content}\n")
+                f.write("\n")
+
+        logger.info("All sections have been successfully processed.")
+        return extracted_data
     except Exception as e:
-        logger.error(f"Failed to extract data from PDF {pdf_file_path}: {e}")
+        logger.error(f"Failed to extract data from PDF {pdf_source}: {e}")
         return None
+    finally:
+        if document is not None:
+            document.close()
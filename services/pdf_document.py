@@ -0,0 +1,83 @@
+from langchain_core.documents import Document
+
+from services.pdf_source import as_pdf_source
+from services.pdf_text_backends import (
+    PDF_TEXT_BACKEND,
+    PYMUPDF_BACKENDS,
+    extract_pages,
+    parser_version,
+)
+from utils.logger import logger
+from utils.parse_cache import load_parsed_pages, save_parsed_pages
+
+
+class ParsedDocument:
+    """
+    A PDF parsed once and shared by every stage of extraction.
+
+    Holds one LangChain Document per page (text plus page metadata) for
+    chunking and prompt building, and a lazily opened PyMuPDF handle for
+    highlighting. Close it, or use it as a context manager, when done.
+    """
+
+    def __init__(self, source, pages):
+        self.source = source
+        self.pages = pages
+        self._handle = None
+
+    def __str__(self):
+        return str(self.source)
+
+    def __len__(self):
+        return len(self.pages)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @property
+    def page_texts(self):
+        return [page.page_content for page in self.pages]
+
+    @property
+    def handle(self):
+        # Opened on first use and kept open for the life of the document
+        if self._handle is None:
+            self._handle = self.source.open_document()
+        return self._handle
+
+    def close(self):
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+
+def load_parsed_document(pdf_source, content_hash=None, backend=PDF_TEXT_BACKEND):
+    pdf_source = as_pdf_source(pdf_source)
+    version = parser_version(backend)
+
+    # Pages parsed by any earlier run with the same parser are reused
+    pages = load_parsed_pages(content_hash, version)
+    if pages is not None:
+        logger.info(f"Loaded {len(pages)} parsed pages for {pdf_source} from cache")
+        return ParsedDocument(pdf_source, [Document(**page) for page in pages])
+
+    document = ParsedDocument(pdf_source, [])
+    try:
+        # PyMuPDF backends extract from the same handle highlighting uses later
+        handle = document.handle if backend in PYMUPDF_BACKENDS else None
+        document.pages = extract_pages(pdf_source, backend=backend, handle=handle)
+    except Exception:
+        document.close()
+        raise
+    save_parsed_pages(
+        content_hash,
+        version,
+        [
+            {"page_content": doc.page_content, "metadata": doc.metadata}
+            for doc in document.pages
+        ],
+    )
+    return document
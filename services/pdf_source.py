@@ -0,0 +1,70 @@
+import io, os
+
+import pymupdf
+
+from utils.common import compute_stream_md5
+
+# Where outputs for in-memory PDFs (highlighted copy, data dump) are written
+OUTPUT_DIR = "tmp"
+
+
+class PdfSource:
+    """
+    A downloaded PDF, held either as bytes in memory or as a file on disk.
+
+    Every consumer (hashing, text extraction, highlighting) reads through this
+    object, so small and medium PDFs never touch the filesystem.
+    """
+
+    def __init__(self, name, path=None, data=None):
+        if path is None and data is None:
+            raise ValueError("PdfSource needs either a path or data")
+        self.name = name
+        self.path = path
+        self.data = data
+
+    def __str__(self):
+        return self.path or f"{self.name} (in memory)"
+
+    @property
+    def in_memory(self):
+        return self.data is not None
+
+    @property
+    def size(self):
+        return len(self.data) if self.in_memory else os.path.getsize(self.path)
+
+    def open(self):
+        # Binary file object positioned at the start of the PDF
+        if self.in_memory:
+            return io.BytesIO(self.data)
+        return open(self.path, "rb")
+
+    def open_document(self):
+        # Open with PyMuPDF without writing in-memory PDFs to disk
+        if self.in_memory:
+            return pymupdf.open(stream=self.data, filetype="pdf")
+        return pymupdf.open(self.path)
+
+    def md5(self):
+        with self.open() as f:
+            return compute_stream_md5(f)
+
+    def output_path(self, suffix):
+        if self.in_memory:
+            os.makedirs(OUTPUT_DIR, exist_ok=True)
+            return os.path.join(OUTPUT_DIR, f"{self.name}{suffix}")
+        return f"{self.path}{suffix}"
+
+
+def download_path(download_dir, file):
+    # Prefixed with the Drive file ID so files sharing a name, such as a
+    # re-upload, never overwrite each other or a file still being parsed
+    return os.path.join(download_dir, f"{file['id']}_{file['name']}")
+
+
+def as_pdf_source(source):
+    # Accept a PdfSource or a plain file path
+    if isinstance(source, PdfSource):
+        return source
+    return PdfSource(os.path.basename(source), path=source)
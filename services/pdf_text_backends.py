@@ -0,0 +1,184 @@
+import math
+import multiprocessing
+import os
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import pymupdf
+import pypdf
+from langchain_core.documents import Document
+
+from services.pdf_source import PdfSource, as_pdf_source
+
+# Page text extraction backend: "pypdf" (pure Python, the original behaviour),
+# "pymupdf" (plain text, much faster) or "pymupdf4llm" (markdown with headings
+# and tables, as used by services/legacy/llm_processor_old.py)
+PDF_TEXT_BACKEND = os.getenv("PDF_TEXT_BACKEND", "pypdf")
+
+# Backends that read through a PyMuPDF handle, which can then be reused for highlighting
+PYMUPDF_BACKENDS = {"pymupdf", "pymupdf4llm"}
+
+# Documents with at least PARALLEL_PARSE_MIN_PAGES pages are split into page
+# ranges and extracted on a pool of PDF_PARSE_WORKERS processes
+PDF_PARSE_WORKERS = int(os.getenv("PDF_PARSE_WORKERS", str(os.cpu_count() or 1)))
+PARALLEL_PARSE_MIN_PAGES = int(os.getenv("PARALLEL_PARSE_MIN_PAGES", "100"))
+
+# Bump when the extraction code in this module changes its output, so cached
+# page text from the old code is not reused
+PARSER_CODE_VERSION = 1
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def _page_document(text, pdf_source, page_number):
+    # Same metadata layout as PyPDFLoader: source plus a 0-based page number
+    return Document(
+        page_content=text,
+        metadata={"source": pdf_source.path or pdf_source.name, "page": page_number},
+    )
+
+
+def extract_pages_pypdf(pdf_source, handle=None, page_range=None):
+    with pdf_source.open() as f:
+        reader = pypdf.PdfReader(f)
+        start, stop = page_range or (0, len(reader.pages))
+        return [
+            _page_document(reader.pages[page_number].extract_text(), pdf_source, page_number)
+            for page_number in range(start, stop)
+        ]
+
+
+def extract_pages_pymupdf(pdf_source, handle=None, page_range=None):
+    doc = handle if handle is not None else pdf_source.open_document()
+    try:
+        start, stop = page_range or (0, len(doc))
+        return [
+            _page_document(doc[page_number].get_text("text"), pdf_source, page_number)
+            for page_number in range(start, stop)
+        ]
+    finally:
+        if handle is None:
+            doc.close()
+
+
+def extract_pages_pymupdf4llm(pdf_source, handle=None, page_range=None):
+    # Imported lazily; only needed when this backend is selected
+    import pymupdf4llm
+
+    doc = handle if handle is not None else pdf_source.open_document()
+    try:
+        start, stop = page_range or (0, len(doc))
+        page_numbers = list(range(start, stop))
+        chunks = pymupdf4llm.to_markdown(
+            doc, pages=page_numbers, page_chunks=True, show_progress=False
+        )
+        return [
+            _page_document(chunk["text"], pdf_source, page_number)
+            for page_number, chunk in zip(page_numbers, chunks)
+        ]
+    finally:
+        if handle is None:
+            doc.close()
+
+
+PDF_TEXT_BACKENDS = {
+    "pypdf": extract_pages_pypdf,
+    "pymupdf": extract_pages_pymupdf,
+    "pymupdf4llm": extract_pages_pymupdf4llm,
+}
+
+
+def parser_version(backend):
+    # Identifies everything that affects extracted text: backend, library
+    # version and this module's code version
+    if backend == "pypdf":
+        library_version = pypdf.__version__
+    elif backend == "pymupdf":
+        library_version = pymupdf.__version__
+    elif backend == "pymupdf4llm":
+        import pymupdf4llm
+
+        library_version = getattr(pymupdf4llm, "__version__", "unknown")
+    else:
+        raise ValueError(f"Unknown PDF text backend {backend!r}")
+    return f"{backend}-{library_version}-v{PARSER_CODE_VERSION}"
+
+
+def _init_parse_worker():
+    # Runs in each pool process. Defined here so unpickling it only imports this
+    # module and its PDF dependencies, never the download or sheets pipeline.
+    # Ctrl-C is left to the parent, which shuts the pool down.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _get_process_pool(workers):
+    # One pool for the life of the process, created once even when several
+    # document workers parse at the same time. Spawned rather than forked,
+    # since the pipeline also runs download and webhook threads; entry scripts
+    # must therefore keep their start-up side effects behind __main__.
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_parse_worker,
+            )
+    return _process_pool
+
+
+def _extract_page_range(backend, name, path, data, page_range):
+    # Runs in a worker process, which reopens the PDF for its own range
+    pdf_source = PdfSource(name, path=path, data=data)
+    return PDF_TEXT_BACKENDS[backend](pdf_source, page_range=page_range)
+
+
+def _page_ranges(num_pages, workers):
+    size = math.ceil(num_pages / workers)
+    return [(start, min(start + size, num_pages)) for start in range(0, num_pages, size)]
+
+
+def extract_pages_parallel(pdf_source, backend, num_pages, workers=PDF_PARSE_WORKERS):
+    executor = _get_process_pool(workers)
+    futures = [
+        executor.submit(
+            _extract_page_range,
+            backend,
+            pdf_source.name,
+            pdf_source.path,
+            pdf_source.data,
+            page_range,
+        )
+        for page_range in _page_ranges(num_pages, workers)
+    ]
+    # Collect in submission order so pages come back in document order
+    pages = []
+    for future in futures:
+        pages.extend(future.result())
+    return pages
+
+
+def extract_pages(pdf_source, backend=PDF_TEXT_BACKEND, handle=None, workers=PDF_PARSE_WORKERS):
+    """
+    Extracts one Document per page with the selected backend. PyMuPDF-based
+    backends use 'handle' if an open document is passed in. Large documents
+    are split across a process pool when more than one worker is configured.
+    """
+    if backend not in PDF_TEXT_BACKENDS:
+        raise ValueError(
+            f"Unknown PDF text backend {backend!r}; expected one of {sorted(PDF_TEXT_BACKENDS)}"
+        )
+    pdf_source = as_pdf_source(pdf_source)
+
+    if workers > 1:
+        if handle is not None:
+            num_pages = len(handle)
+        else:
+            with pdf_source.open_document() as doc:
+                num_pages = len(doc)
+        if num_pages >= PARALLEL_PARSE_MIN_PAGES:
+            return extract_pages_parallel(pdf_source, backend, num_pages, workers)
+
+    return PDF_TEXT_BACKENDS[backend](pdf_source, handle=handle)
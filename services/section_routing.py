@@ -0,0 +1,126 @@
+import os, re
+
+from services.text_filters import normalize_heading
+from utils.logger import logger
+
+# Sections are routed to the pages of the matching outline or table of
+# contents entries, so their retrieval and prompt context skip the rest of
+# the document. Sections with no match keep searching every page.
+SECTION_ROUTING_ENABLED = os.getenv("SECTION_ROUTING_ENABLED", "true").lower() == "true"
+# Routed ranges longer than this are assumed to be a bad match and ignored
+ROUTE_MAX_PAGES = int(os.getenv("ROUTE_MAX_PAGES", "40"))
+# Printed tables of contents are looked for in the first pages only
+TOC_SCAN_PAGES = 15
+# Printed page numbers usually trail the PDF page index by the cover pages
+TOC_MAX_PAGE_OFFSET = 20
+
+SECTION_HEADING_PATTERNS = {
+    "Leadership": re.compile(
+        r"\bmanagement\b|\bthe sponsor\b|key personnel|officers and directors|\bleadership\b",
+        re.I,
+    ),
+    "Compensation": re.compile(r"compensation|fees and expenses", re.I),
+    "Track Record": re.compile(r"prior performance|track record|prior programs", re.I),
+    "Use of Proceeds": re.compile(r"use of proceeds|sources and uses", re.I),
+    "Projected Results": re.compile(
+        r"projections|projected|pro forma|forecast|financial information", re.I
+    ),
+}
+
+# "USE OF PROCEEDS ........ 23" in a printed table of contents
+_TOC_LINE = re.compile(r"^(?P<title>.*?[A-Za-z].*?)[\s.…_]{2,}(?P<page>\d{1,4})\s*$")
+
+
+def _outline_entries(document):
+    # (title, 0-based start page, level) from the PDF bookmarks
+    try:
+        toc = document.handle.get_toc(simple=True)
+    except Exception as e:
+        logger.warning(f"Could not read the outline of {document}: {e}")
+        return []
+    return [(title, page - 1, level) for level, title, page in toc if page >= 1]
+
+
+def _printed_toc_entries(document):
+    # (title, 0-based start page, 1) from a printed table of contents, with
+    # printed page numbers mapped to PDF pages by finding the heading itself
+    page_texts = document.page_texts
+    entries = []
+    for page_number, text in enumerate(page_texts[:TOC_SCAN_PAGES]):
+        for line in text.splitlines():
+            match = _TOC_LINE.match(line.strip())
+            if match:
+                entries.append((match.group("title").strip(), int(match.group("page")), page_number))
+    if len(entries) < 3:
+        return []
+
+    toc_pages = {toc_page for _, _, toc_page in entries}
+    resolved, offsets = [], []
+    for title, printed_page, _ in entries:
+        heading = normalize_heading(title)
+        start = max(printed_page - 1, 0)
+        found = next(
+            (
+                page_number
+                for page_number in range(start, min(start + TOC_MAX_PAGE_OFFSET, len(page_texts)))
+                if page_number not in toc_pages
+                and any(normalize_heading(line) == heading for line in page_texts[page_number].splitlines())
+            ),
+            None,
+        )
+        if found is not None:
+            offsets.append(found - start)
+        resolved.append((title, start, found))
+
+    if not offsets:
+        return []
+    # Entries whose heading was not found use the typical offset of the rest
+    offset = sorted(offsets)[len(offsets) // 2]
+    return [
+        (title, found if found is not None else start + offset, 1)
+        for title, start, found in resolved
+    ]
+
+
+def _entry_ranges(entries, num_pages):
+    # Each entry runs until the next entry at the same or a higher level
+    ranges = []
+    for index, (title, start, level) in enumerate(entries):
+        end = num_pages
+        for _, next_start, next_level in entries[index + 1:]:
+            if next_level <= level and next_start >= start:
+                end = next_start
+                break
+        # A section sharing its page with the next heading still keeps that page
+        ranges.append((title, start, max(end, start + 1)))
+    return ranges
+
+
+def route_sections(document):
+    """
+    Maps each section name in SECTION_HEADING_PATTERNS to a sorted list of
+    0-based page numbers, using the PDF outline when present and a printed
+    table of contents otherwise. Sections with no usable match are left out.
+    """
+    if not SECTION_ROUTING_ENABLED:
+        return {}
+
+    entries = _outline_entries(document) or _printed_toc_entries(document)
+    if not entries:
+        logger.info(f"No outline or table of contents found in {document}; sections are not routed.")
+        return {}
+
+    routes = {}
+    for title, start, end in _entry_ranges(entries, len(document)):
+        for section, pattern in SECTION_HEADING_PATTERNS.items():
+            if pattern.search(title) and 0 <= start < len(document):
+                routes.setdefault(section, set()).update(range(start, min(end, len(document))))
+
+    routed = {}
+    for section, pages in routes.items():
+        if len(pages) > ROUTE_MAX_PAGES:
+            logger.info(f"Ignoring route for {section}: {len(pages)} pages is too broad.")
+            continue
+        routed[section] = sorted(pages)
+        logger.info(f"Routed {section} to pages {routed[section][0] + 1}-{routed[section][-1] + 1}")
+    return routed
@@ -0,0 +1,236 @@
+import os, re, json
+
+from utils.logger import logger
+
+# Use of Proceeds and Projected Results are plain tables in a PPM, so they are
+# read with PyMuPDF table detection first and only sent to the LLM when no
+# usable table is found
+TABLE_EXTRACTION_ENABLED = os.getenv("TABLE_EXTRACTION_ENABLED", "true").lower() == "true"
+# At most this many candidate pages are scanned per section
+TABLE_MAX_CANDIDATE_PAGES = int(os.getenv("TABLE_MAX_CANDIDATE_PAGES", "12"))
+# Bump when the table parsing in this module changes its output, so cached
+# extraction results from the old code are not reused
+TABLE_CODE_VERSION = 1
+
+USE_OF_PROCEEDS_PAGE_PATTERN = re.compile(r"use of proceeds|sources and uses", re.I)
+PROJECTED_RESULTS_PAGE_PATTERN = re.compile(
+    r"projected|projections|pro forma|forecast", re.I
+)
+
+# Row label patterns for each field, checked in order
+USE_OF_PROCEEDS_ROWS = [
+    ("Loan_Proceeds", re.compile(r"loan|mortgage|debt financing", re.I)),
+    ("Equity_Proceeds", re.compile(r"equity|offering proceeds|gross offering", re.I)),
+    ("Selling_Commissions", re.compile(r"commission", re.I)),
+    ("Property_Purchase_Price", re.compile(r"purchase price", re.I)),
+    ("Trust_Held_Reserve", re.compile(r"reserve", re.I)),
+    ("Acquisition_Fees", re.compile(r"acquisition fee", re.I)),
+    ("Bridge_Costs", re.compile(r"bridge", re.I)),
+]
+TOTAL_ROW = re.compile(r"^\s*total", re.I)
+
+PROJECTED_RESULTS_ROWS = [
+    ("Total_Expenses", re.compile(r"total (operating )?expenses", re.I)),
+    ("NOI", re.compile(r"net operating income|\bnoi\b", re.I)),
+    (
+        "Gross_Revenue",
+        re.compile(r"gross revenue|total revenue|effective gross income|total income", re.I),
+    ),
+    ("Cash_on_Cash", re.compile(r"cash[- ]on[- ]cash|distribution rate", re.I)),
+    ("Ending_Balance", re.compile(r"ending (reserve )?balance|reserve balance", re.I)),
+]
+
+AMOUNT_PATTERN = re.compile(r"^\(?\$?\s*\(?[\d,]+(\.\d+)?\)?$")
+PERCENT_PATTERN = re.compile(r"^\(?-?[\d.]+\s*%\)?$")
+YEAR_HEADER_PATTERN = re.compile(r"^year\s*(\d{1,2})$", re.I)
+CALENDAR_YEAR_PATTERN = re.compile(r"^(19|20)\d{2}$")
+
+
+def _clean_cell(cell):
+    return re.sub(r"\s+", " ", cell or "").strip()
+
+
+def _to_number(text):
+    negative = text.startswith("(") and text.endswith(")")
+    digits = re.sub(r"[^\d.]", "", text)
+    if not digits:
+        return None
+    value = float(digits)
+    return -value if negative else value
+
+
+def _format_amount(text):
+    return text if "$" in text else f"${text}"
+
+
+def _format_percent(value):
+    return f"{value:.2f}%"
+
+
+def _candidate_pages(document, pattern):
+    # Pages mentioning the section, in document order
+    pages = [
+        page_number
+        for page_number, text in enumerate(document.page_texts)
+        if pattern.search(text)
+    ]
+    return pages[:TABLE_MAX_CANDIDATE_PAGES]
+
+
+def _page_tables(document, page_number):
+    try:
+        return [table.extract() for table in document.handle[page_number].find_tables().tables]
+    except Exception as e:
+        logger.warning(f"Table detection failed on page {page_number + 1}: {e}")
+        return []
+
+
+def extract_use_of_proceeds_table(document, deal_id):
+    """
+    Returns the Use of Proceeds section as the JSON string process_file
+    expects, or None when no table with enough of the known rows is found.
+    """
+    for page_number in _candidate_pages(document, USE_OF_PROCEEDS_PAGE_PATTERN):
+        for rows in _page_tables(document, page_number):
+            item = {}
+            totals = []
+            for row in rows:
+                cells = [_clean_cell(cell) for cell in row]
+                cells = [cell for cell in cells if cell]
+                if len(cells) < 2:
+                    continue
+                label = cells[0]
+                amount = next((cell for cell in cells[1:] if AMOUNT_PATTERN.match(cell)), None)
+                percent = next((cell for cell in cells[1:] if PERCENT_PATTERN.match(cell)), None)
+                if amount is None:
+                    continue
+                if TOTAL_ROW.match(label):
+                    totals.append(amount)
+                    continue
+                for field, pattern in USE_OF_PROCEEDS_ROWS:
+                    if field not in item and pattern.search(label):
+                        item[field] = _format_amount(amount)
+                        if percent:
+                            item[f"{field}_%"] = percent
+                        break
+
+            # Require the core rows before trusting the table over the LLM
+            if not totals or not {"Loan_Proceeds", "Equity_Proceeds", "Property_Purchase_Price"} <= item.keys():
+                continue
+
+            total = max(totals, key=lambda text: _to_number(text) or 0)
+            item["Total"] = _format_amount(total)
+            total_value = _to_number(total)
+            loan_value = _to_number(item["Loan_Proceeds"])
+            purchase_value = _to_number(item["Property_Purchase_Price"])
+            if total_value:
+                item["LTV_%"] = _format_percent(100 * loan_value / total_value)
+                item["Syndication_Load_%"] = _format_percent(
+                    100 * (total_value - purchase_value) / total_value
+                )
+
+            fields = ["Deal_ID"] + [
+                name
+                for field, _ in USE_OF_PROCEEDS_ROWS
+                for name in (field, f"{field}_%")
+            ] + ["Total", "LTV_%", "Syndication_Load_%"]
+            item["Deal_ID"] = deal_id
+            logger.info(f"Use of Proceeds read from the table on page {page_number + 1}")
+            return json.dumps(
+                {"Use of Proceeds": [{field: item.get(field, "N/A") for field in fields}]}
+            )
+    return None
+
+
+def _year_columns(header):
+    # Map column index to "Year_N" from "Year 1" or calendar-year headings
+    columns = {}
+    calendar_years = []
+    for index, cell in enumerate(header):
+        cell = _clean_cell(cell)
+        match = YEAR_HEADER_PATTERN.match(cell)
+        if match:
+            columns[index] = f"Year_{int(match.group(1))}"
+        elif CALENDAR_YEAR_PATTERN.match(cell):
+            calendar_years.append((index, int(cell)))
+    if not columns and calendar_years:
+        first_year = min(year for _, year in calendar_years)
+        columns = {index: f"Year_{year - first_year + 1}" for index, year in calendar_years}
+    return columns
+
+
+def extract_projected_results_table(document, deal_id, extra_pages=()):
+    """
+    Returns the Projected Results section as the JSON string process_file
+    expects, or None when no projection table is found. Tables split across
+    pages (e.g. years 1-5 and 6-11) are merged.
+    """
+    page_numbers = _candidate_pages(document, PROJECTED_RESULTS_PAGE_PATTERN)
+    page_numbers += [page for page in extra_pages if page not in page_numbers]
+
+    years = {}
+    source_pages = set()
+    for page_number in page_numbers:
+        for rows in _page_tables(document, page_number):
+            if not rows:
+                continue
+            columns = _year_columns(rows[0])
+            if len(columns) < 2:
+                continue
+            for row in rows[1:]:
+                label = _clean_cell(row[0]) if row else ""
+                field = next(
+                    (field for field, pattern in PROJECTED_RESULTS_ROWS if pattern.search(label)),
+                    None,
+                )
+                if field is None:
+                    continue
+                for index, year in columns.items():
+                    value = _clean_cell(row[index]) if index < len(row) else ""
+                    if value:
+                        years.setdefault(year, {}).setdefault(field, value)
+                        source_pages.add(page_number + 1)
+
+    if len(years) < 2 or not any(
+        "NOI" in values or "Gross_Revenue" in values for values in years.values()
+    ):
+        return None
+
+    item = {"Deal_ID": deal_id}
+    for year in sorted(years, key=lambda year: int(year.replace("Year_", ""))):
+        item[year] = {
+            field: years[year].get(field, "N/A")
+            for field in ["Cash_on_Cash", "Ending_Balance", "Gross_Revenue", "Total_Expenses", "NOI"]
+        }
+    logger.info(f"Projected Results read from tables on pages {sorted(source_pages)}")
+    return json.dumps({"Projected Results": [item]})
+
+
+def extract_table_sections(document, deal_id):
+    """
+    Runs deterministic table extraction for the tabular sections. Returns a
+    dict of section name to JSON string for the sections that were found;
+    the rest should fall back to the LLM.
+    """
+    if not TABLE_EXTRACTION_ENABLED:
+        return {}
+
+    results = {}
+    extractors = {
+        "Use of Proceeds": lambda: extract_use_of_proceeds_table(document, deal_id),
+        # The projections usually sit in the last pages, as the LLM prompt assumes
+        "Projected Results": lambda: extract_projected_results_table(
+            document, deal_id, extra_pages=range(max(len(document) - 10, 0), len(document))
+        ),
+    }
+    for section, extract in extractors.items():
+        try:
+            data = extract()
+        except Exception as e:
+            logger.warning(f"Table extraction for {section} failed: {e}")
+            data = None
+        if data:
+            results[section] = data
+        else:
+            logger.info(f"No usable {section} table found; falling back to the LLM.")
+    return results
@@ -0,0 +1,184 @@
+import os, re
+
+from langchain_core.documents import Document
+
+from utils.logger import logger
+from utils.tokens import count_tokens
+
+# Legal sections that never feed the extracted fields, based on the list in
+# services/legacy/llm_processor_old.clean_extracted_text. Sections the prompts
+# need (compensation, management, prior performance, use of proceeds,
+# projections) are deliberately left out. Override with a comma-separated
+# BOILERPLATE_SECTIONS.
+DEFAULT_BOILERPLATE_SECTIONS = [
+    "Risk Factors",
+    "Federal Income Tax Consequences",
+    "Material Federal Income Tax Consequences",
+    "Plan of Distribution",
+    "Conflicts of Interest",
+    "Who May Invest",
+    "Investor Suitability Requirements",
+    "How to Subscribe",
+    "Subscription Procedures",
+    "Legal Matters",
+    "Legal Disclaimers",
+    "Litigation",
+    "Litigation and Legal Proceedings",
+    "ERISA Considerations",
+    "Reports and Additional Information",
+    "A Warning About Forward-Looking Statements",
+    "Forward-Looking Statements",
+]
+
+BOILERPLATE_FILTER_ENABLED = os.getenv("BOILERPLATE_FILTER_ENABLED", "true").lower() == "true"
+BOILERPLATE_SECTIONS = [
+    section.strip()
+    for section in os.getenv("BOILERPLATE_SECTIONS", "").split(",")
+    if section.strip()
+] or DEFAULT_BOILERPLATE_SECTIONS
+
+# A line is treated as a running header/footer when it sits among the first or
+# last REPEATED_LINE_EDGE_LINES lines of a page and recurs on at least
+# REPEATED_LINE_MIN_FRACTION of the document's pages
+HEADER_FOOTER_STRIP_ENABLED = os.getenv("HEADER_FOOTER_STRIP_ENABLED", "true").lower() == "true"
+REPEATED_LINE_MIN_FRACTION = float(os.getenv("REPEATED_LINE_MIN_FRACTION", "0.3"))
+REPEATED_LINE_EDGE_LINES = int(os.getenv("REPEATED_LINE_EDGE_LINES", "4"))
+REPEATED_LINE_MIN_PAGES = 3
+
+# Trailing dot leaders and page numbers, as in a printed table of contents
+_TOC_SUFFIX = re.compile(r"[\s.…_-]*\d*\s*$")
+
+
+def normalize_heading(line):
+    line = _TOC_SUFFIX.sub("", line.strip())
+    line = line.replace("–", "-").replace("—", "-")
+    return re.sub(r"\s+", " ", line).strip().lower()
+
+
+def _repeat_key(line):
+    # Digits are masked so "Page 12 of 300" and "- 13 -" match across pages
+    return re.sub(r"\d+", "#", re.sub(r"\s+", " ", line.strip())).lower()
+
+
+def _edge_lines(lines):
+    non_blank = [line for line in lines if line.strip()]
+    return non_blank[:REPEATED_LINE_EDGE_LINES] + non_blank[-REPEATED_LINE_EDGE_LINES:]
+
+
+def find_repeated_lines(pages, min_fraction=REPEATED_LINE_MIN_FRACTION):
+    # Returns the keys of header/footer lines shared by many pages
+    if len(pages) < REPEATED_LINE_MIN_PAGES:
+        return set()
+    counts = {}
+    for page in pages:
+        for key in {_repeat_key(line) for line in _edge_lines(page.page_content.splitlines())}:
+            counts[key] = counts.get(key, 0) + 1
+    threshold = max(REPEATED_LINE_MIN_PAGES, min_fraction * len(pages))
+    return {key for key, count in counts.items() if key and count >= threshold}
+
+
+def strip_repeated_lines(pages, min_fraction=REPEATED_LINE_MIN_FRACTION):
+    """
+    Removes running headers, footers and legends (the sponsor name, the
+    "CONFIDENTIAL PRIVATE PLACEMENT MEMORANDUM" banner, page numbers) from
+    the edges of every page. Returns (pages, removed_text).
+    """
+    repeated = find_repeated_lines(pages, min_fraction)
+    if not repeated:
+        return pages, ""
+
+    stripped_pages, removed = [], []
+    for page in pages:
+        lines = page.page_content.splitlines()
+        edge_keys = {_repeat_key(line) for line in _edge_lines(lines)}
+        kept_lines = []
+        for line in lines:
+            key = _repeat_key(line)
+            # Only strip the line where it sits at the edge of this page
+            if key in repeated and key in edge_keys:
+                removed.append(line)
+            else:
+                kept_lines.append(line)
+        stripped_pages.append(
+            Document(page_content="\n".join(kept_lines), metadata=page.metadata)
+        )
+    return stripped_pages, "\n".join(removed)
+
+
+def apply_header_footer_strip(pages):
+    # Strip repeated lines and log the characters and tokens saved per document
+    if not HEADER_FOOTER_STRIP_ENABLED:
+        return pages
+
+    stripped_pages, removed_text = strip_repeated_lines(pages)
+    if removed_text:
+        logger.info(
+            f"Header/footer strip removed {len(removed_text)} characters and "
+            f"{count_tokens(removed_text)} tokens across {len(pages)} pages."
+        )
+    return stripped_pages
+
+
+def is_major_heading(line):
+    """
+    PPMs set their top-level sections in capitals ("RISK FACTORS"), while
+    subsections such as "Risks Related to the Property" are in title case.
+    """
+    text = _TOC_SUFFIX.sub("", line.strip())
+    letters = [char for char in text if char.isalpha()]
+    return (
+        len(letters) >= 4
+        and len(text) <= 80
+        and all(char.isupper() for char in letters)
+        and not text.endswith(".")
+    )
+
+
+def filter_boilerplate_pages(pages, sections=None):
+    """
+    Drops the lines of boilerplate sections from a list of page Documents.
+
+    A section starts at a capitalised heading matching one of 'sections' and
+    runs until the next capitalised heading that does not. Pages left empty
+    are removed. Returns (kept_pages, removed_pages); removed_pages holds the
+    dropped text so callers can report what was saved.
+    """
+    drop_headings = {normalize_heading(section) for section in (sections or BOILERPLATE_SECTIONS)}
+    kept_pages, removed_pages = [], []
+    dropping = False
+
+    for page in pages:
+        kept_lines, removed_lines = [], []
+        for line in page.page_content.splitlines():
+            if is_major_heading(line):
+                dropping = normalize_heading(line) in drop_headings
+            (removed_lines if dropping else kept_lines).append(line)
+
+        if removed_lines:
+            removed_pages.append(
+                Document(page_content="\n".join(removed_lines), metadata=page.metadata)
+            )
+        if any(line.strip() for line in kept_lines):
+            kept_pages.append(
+                Document(page_content="\n".join(kept_lines), metadata=page.metadata)
+                if removed_lines
+                else page
+            )
+
+    return kept_pages, removed_pages
+
+
+def apply_boilerplate_filter(pages, text_splitter):
+    # Filter pages before chunking and log the chunks and tokens it saved
+    if not BOILERPLATE_FILTER_ENABLED:
+        return pages
+
+    kept_pages, removed_pages = filter_boilerplate_pages(pages)
+    if removed_pages:
+        removed_chunks = len(text_splitter.split_documents(removed_pages))
+        removed_tokens = sum(count_tokens(page.page_content) for page in removed_pages)
+        logger.info(
+            f"Boilerplate filter removed {len(pages) - len(kept_pages)} of {len(pages)} "
+            f"pages, ~{removed_chunks} chunks and {removed_tokens} tokens before embedding."
+        )
+    return kept_pages
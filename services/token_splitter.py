@@ -0,0 +1,124 @@
+import os
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter, TextSplitter
+
+from services.text_filters import is_major_heading
+from utils.tokens import EMBEDDING_MODEL, get_encoding
+
+# "recursive" keeps the original character splitter; "tokens" measures chunks
+# in embedding-model tokens and breaks on paragraphs and headings
+TEXT_SPLITTER = os.getenv("TEXT_SPLITTER", "recursive")
+# 2000 characters is roughly 500 tokens of PPM prose
+TOKEN_CHUNK_SIZE = int(os.getenv("TOKEN_CHUNK_SIZE", "500"))
+TOKEN_CHUNK_OVERLAP = int(os.getenv("TOKEN_CHUNK_OVERLAP", "50"))
+
+
+def _is_heading(line):
+    # Capitalised PPM headings, or markdown headings from pymupdf4llm
+    return line.lstrip().startswith("#") or is_major_heading(line)
+
+
+def _blocks(text):
+    # Paragraphs separated by blank lines; a heading always starts a new block
+    blocks, current = [], []
+    for line in text.splitlines():
+        if not line.strip():
+            if current:
+                blocks.append(("\n".join(current), False))
+                current = []
+            continue
+        if _is_heading(line):
+            if current:
+                blocks.append(("\n".join(current), False))
+            blocks.append((line, True))
+            current = []
+            continue
+        current.append(line)
+    if current:
+        blocks.append(("\n".join(current), False))
+    return blocks
+
+
+class TokenTextSplitter(TextSplitter):
+    """
+    Packs whole paragraphs into chunks of about chunk_size tokens of the
+    embedding model. Each heading starts a new chunk, so a section title is
+    never left dangling at the end of the previous section. Paragraphs
+    longer than a chunk are cut on token boundaries. Trailing paragraphs of
+    up to chunk_overlap tokens are repeated at the start of the next chunk
+    within the same section.
+    """
+
+    def __init__(
+        self,
+        chunk_size=TOKEN_CHUNK_SIZE,
+        chunk_overlap=TOKEN_CHUNK_OVERLAP,
+        model=EMBEDDING_MODEL,
+        **kwargs,
+    ):
+        self._encoding = get_encoding(model)
+        super().__init__(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            length_function=self._token_length,
+            **kwargs,
+        )
+
+    def _token_length(self, text):
+        return len(self._encoding.encode_ordinary(text))
+
+    def _split_long_block(self, tokens):
+        step = self._chunk_size - self._chunk_overlap
+        return [
+            self._encoding.decode(tokens[start:start + self._chunk_size])
+            for start in range(0, len(tokens), step)
+        ]
+
+    def split_text(self, text):
+        blocks = _blocks(text)
+        # One batched call instead of encoding every paragraph separately
+        block_tokens = self._encoding.encode_ordinary_batch([block for block, _ in blocks])
+
+        chunks, current, current_size = [], [], 0
+
+        def flush():
+            if current:
+                chunks.append("\n\n".join(block for block, _ in current))
+
+        for (block, heading), tokens in zip(blocks, block_tokens):
+            size = len(tokens)
+            if heading:
+                flush()
+                current, current_size = [(block, size)], size
+                continue
+
+            if size > self._chunk_size:
+                flush()
+                chunks.extend(self._split_long_block(tokens))
+                current, current_size = [], 0
+                continue
+
+            if current_size + size > self._chunk_size:
+                flush()
+                # Carry trailing paragraphs forward as overlap
+                overlap, overlap_size = [], 0
+                for previous, previous_size in reversed(current):
+                    if overlap_size + previous_size > self._chunk_overlap:
+                        break
+                    overlap.insert(0, (previous, previous_size))
+                    overlap_size += previous_size
+                current, current_size = overlap, overlap_size
+
+            current.append((block, size))
+            current_size += size
+
+        flush()
+        return chunks
+
+
+def create_text_splitter(splitter=TEXT_SPLITTER):
+    if splitter == "recursive":
+        return RecursiveCharacterTextSplitter(chunk_size=2000, chunk_overlap=200)
+    if splitter == "tokens":
+        return TokenTextSplitter()
+    raise ValueError(f"Unknown text splitter {splitter!r}; expected 'recursive' or 'tokens'")
@@ -0,0 +1,217 @@
+import os, hashlib, json
+from typing import Any, List, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from utils.index_cache import load_index, save_index
+from utils.logger import logger
+
+# "numpy" searches each document's chunks with a brute-force cosine top-k;
+# "chroma" keeps the original per-document Chroma collection
+VECTOR_STORE = os.getenv("VECTOR_STORE", "numpy")
+# float16 halves the stored matrix and int8 (with a per-row scale) quarters
+# it, at a small cost in precision. Searches run on a float32 copy made once
+# per store, so these modes shrink the on-disk index, not query-time memory.
+VECTOR_DTYPE = os.getenv("VECTOR_DTYPE", "float32")
+VECTOR_DTYPES = {"float32", "float16", "int8"}
+
+
+def index_key(content_hash, settings):
+    # Identifies an index by document and by everything that shaped its chunks
+    # and vectors, so a config change never reuses a stale index
+    if not content_hash:
+        return None
+    digest = hashlib.md5(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()
+    return f"{content_hash}-{digest[:12]}"
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def quantize(vectors, dtype):
+    # Returns (matrix, scales); scales is None for float dtypes
+    dtype = np.dtype(dtype)
+    if dtype != np.int8:
+        return vectors.astype(dtype), None
+    # Symmetric per-row quantisation: each row is stored as int8 times its scale
+    scales = np.abs(vectors).max(axis=1) / 127
+    scales[scales == 0] = 1
+    matrix = np.round(vectors / scales[:, None]).astype(np.int8)
+    return matrix, scales.astype(np.float32)
+
+
+class NumpyVectorStore:
+    """
+    In-process vector store for one document's chunks.
+
+    Vectors are normalised on insert and kept in a single contiguous matrix,
+    so a query is one matrix-vector product plus a partial sort. Exposes the
+    subset of the Chroma API the extraction chain uses: add_documents,
+    similarity_search, as_retriever and delete_collection.
+    """
+
+    def __init__(self, embedding_function, dtype=VECTOR_DTYPE):
+        if str(np.dtype(dtype)) not in VECTOR_DTYPES:
+            raise ValueError(
+                f"Unknown vector dtype {dtype!r}; expected one of {sorted(VECTOR_DTYPES)}"
+            )
+        self.embedding_function = embedding_function
+        self.dtype = np.dtype(dtype)
+        self.texts = []
+        self.metadatas = []
+        self._batches = []
+        self._scale_batches = []
+        self._matrix = None
+        self._scales = None
+        self._search_matrix = None
+        self._pages = None
+
+    def __len__(self):
+        return len(self.texts)
+
+    @classmethod
+    def load(cls, key, embedding_function):
+        # Reopens a saved index. A float32 matrix stays memory-mapped and is
+        # searched in place; float16 and int8 are dequantised on first search
+        index = load_index(key)
+        if index is None:
+            return None
+        texts, metadatas, matrix, scales = index
+        store = cls(embedding_function, dtype=matrix.dtype)
+        store.texts, store.metadatas = texts, metadatas
+        store._matrix = matrix
+        store._batches = [matrix]
+        if scales is not None:
+            store._scales = scales
+            store._scale_batches = [scales]
+        logger.info(f"Loaded vector index {key} with {len(texts)} chunks")
+        return store
+
+    def save(self, key):
+        save_index(key, self.texts, self.metadatas, self.matrix, self.scales)
+
+    def add_documents(self, documents):
+        texts = [doc.page_content for doc in documents]
+        vectors = np.asarray(self.embedding_function.embed_documents(texts), dtype=np.float32)
+        self.add_vectors(texts, [doc.metadata for doc in documents], vectors)
+
+    def add_vectors(self, texts, metadatas, vectors):
+        self.texts.extend(texts)
+        self.metadatas.extend(metadatas)
+        matrix, scales = quantize(_normalize(np.asarray(vectors, dtype=np.float32)), self.dtype)
+        self._batches.append(matrix)
+        if scales is not None:
+            self._scale_batches.append(scales)
+        # Rebuilt as one contiguous matrix on the next search
+        self._matrix = None
+        self._scales = None
+        self._search_matrix = None
+        self._pages = None
+
+    @property
+    def matrix(self):
+        if self._matrix is None:
+            self._matrix = (
+                np.concatenate(self._batches) if self._batches else np.empty((0, 0), self.dtype)
+            )
+            self._batches = [self._matrix]
+        return self._matrix
+
+    @property
+    def scales(self):
+        # Per-row scales of an int8 matrix, otherwise None
+        if self._scales is None and self._scale_batches:
+            self._scales = np.concatenate(self._scale_batches)
+            self._scale_batches = [self._scales]
+        return self._scales
+
+    @property
+    def search_matrix(self):
+        # float32 copy of the stored vectors, dequantised once so every query
+        # is a BLAS matrix-vector product rather than a per-query conversion
+        if self._search_matrix is None:
+            matrix = self.matrix
+            if matrix.dtype == np.float32:
+                self._search_matrix = matrix
+            else:
+                self._search_matrix = matrix.astype(np.float32)
+                if self.scales is not None:
+                    self._search_matrix *= self.scales[:, None]
+        return self._search_matrix
+
+    @property
+    def nbytes(self):
+        # Size of the stored vectors, as saved to disk
+        scales = self.scales
+        return self.matrix.nbytes + (scales.nbytes if scales is not None else 0)
+
+    @property
+    def pages(self):
+        # Page numbers of the chunks, for routed searches; -1 when unknown
+        if self._pages is None:
+            self._pages = np.array(
+                [metadata.get("page", -1) for metadata in self.metadatas], dtype=np.int64
+            )
+        return self._pages
+
+    def search_vector(self, query_vector, k=4, pages=None):
+        # Returns (indexes, scores) of the k most similar chunks
+        if not self.texts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        query = _normalize(np.asarray(query_vector, dtype=np.float32))
+        scores = self.search_matrix @ query
+        if pages is not None:
+            scores[~np.isin(self.pages, pages)] = -np.inf
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        top = top[np.isfinite(scores[top])]
+        return top, scores[top]
+
+    def similarity_search(self, query, k=4, pages=None):
+        indexes, _ = self.search_vector(self.embedding_function.embed_query(query), k, pages)
+        return [
+            Document(page_content=self.texts[index], metadata=self.metadatas[index])
+            for index in indexes
+        ]
+
+    def as_retriever(self, search_kwargs=None, **kwargs):
+        # Accepts Chroma-style search_kwargs, including a {"page": {"$in": [...]}} filter
+        search_kwargs = {**kwargs, **(search_kwargs or {})}
+        page_filter = (search_kwargs.get("filter") or {}).get("page")
+        pages = page_filter.get("$in") if isinstance(page_filter, dict) else None
+        return NumpyRetriever(store=self, k=search_kwargs.get("k", 4), pages=pages)
+
+    def delete_collection(self):
+        # Drops the in-memory copy only; a saved index stays on disk for reuse
+        self.texts, self.metadatas, self._batches, self._scale_batches = [], [], [], []
+        self._matrix = None
+        self._scales = None
+        self._search_matrix = None
+        self._pages = None
+
+
+class NumpyRetriever(BaseRetriever):
+    """LangChain retriever over a NumpyVectorStore."""
+
+    store: Any
+    k: int = 4
+    pages: Optional[List[int]] = None
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        return self.store.similarity_search(query, self.k, self.pages)
+
+
+def create_vector_store(embeddings, backend=VECTOR_STORE):
+    if backend == "numpy":
+        return NumpyVectorStore(embeddings)
+    if backend == "chroma":
+        # Imported lazily; only needed when this backend is selected
+        from langchain_chroma import Chroma
+
+        return Chroma(embedding_function=embeddings)
+    raise ValueError(f"Unknown vector store {backend!r}; expected 'numpy' or 'chroma'")
@@ -0,0 +1,50 @@
+import os, json, shutil
+
+from utils.logger import logger
+
+# Per-document stage outputs, keyed by the PDF's content hash. A document's
+# checkpoints are removed once it has been fully written to the sheets.
+CHECKPOINT_DIR = os.getenv("CHECKPOINT_DIR", os.path.join("cache", "checkpoints"))
+
+
+def _checkpoint_path(key, stage, extension):
+    return os.path.join(CHECKPOINT_DIR, key, f"{stage}.{extension}")
+
+
+def _atomic_write(path, write):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(key, stage):
+    if not key:
+        return None
+    path = _checkpoint_path(key, stage, "json")
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning(f"Ignoring unreadable checkpoint {path}: {e}")
+        return None
+
+
+def save_checkpoint(key, stage, data):
+    if not key:
+        return
+    try:
+        _atomic_write(
+            _checkpoint_path(key, stage, "json"),
+            lambda f: f.write(json.dumps(data).encode("utf-8")),
+        )
+    except OSError as e:
+        logger.error(f"Failed to save {stage} checkpoint for {key}: {e}")
+
+
+def clear_checkpoints(key):
+    if key:
+        shutil.rmtree(os.path.join(CHECKPOINT_DIR, key), ignore_errors=True)
@@ -1,4 +1,4 @@
-import os, re
+import os, re, hashlib
 
 
 def load_processed_file_ids(filename):
@@ -10,10 +10,16 @@ def load_processed_file_ids(filename):
     return processed_file_ids
 
 
-def save_processed_file_ids(filename, processed_file_ids):
+def load_start_page_token(filename):
+    if os.path.exists(filename):
+        with open(filename, "r") as f:
+            return f.read().strip() or None
+    return None
+
+
+def save_start_page_token(filename, token):
     with open(filename, "w") as f:
-        for file_id in processed_file_ids:
-            f.write(f"{file_id}\n")
+        f.write(token)
 
 
 def clean_extracted_data(data):
@@ -86,3 +92,15 @@ sheet_headers = {
     # We'll generate headers for "Projected Results" and "Final Data Table" dynamically
 }
 
+
+
+def compute_stream_md5(f, chunk_size=1024 * 1024):
+    """
+    Computes the MD5 hex digest of a binary file object. This matches the
+    md5Checksum Drive reports for binary files, so both can key the same caches.
+    """
+    digest = hashlib.md5()
+    for chunk in iter(lambda: f.read(chunk_size), b""):
+        digest.update(chunk)
+    return digest.hexdigest()
+
@@ -0,0 +1,89 @@
+import os, hashlib, sqlite3, threading
+
+import numpy as np
+
+from utils.logger import logger
+
+# Chunk and query vectors keyed by (model, dimensions, text hash). Entries are
+# never invalidated: the same text always embeds to the same vector for a
+# given model and dimension count.
+EMBEDDING_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH", os.path.join("cache", "embeddings.db")
+)
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    SQLite-backed vector store for embeddings already paid for. Vectors are
+    stored as float32 blobs; lookups and inserts are batched per call.
+    """
+
+    def __init__(self, db_path=EMBEDDING_CACHE_PATH):
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        # Autocommit mode; the lock serialises access from worker threads
+        self._conn = sqlite3.connect(
+            db_path, check_same_thread=False, isolation_level=None
+        )
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    dimensions INTEGER NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    PRIMARY KEY (model, dimensions, text_hash)
+                )
+                """
+            )
+
+    def get_many(self, model, dimensions, hashes):
+        # Returns {text_hash: vector} for the hashes that are cached
+        found = {}
+        unique = list(dict.fromkeys(hashes))
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(unique), 500):
+            batch = unique[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND dimensions = ? AND text_hash IN ({placeholders})",
+                    [model, dimensions or 0, *batch],
+                ).fetchall()
+            for hash_, blob in rows:
+                found[hash_] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, model, dimensions, items):
+        # items is a list of (text_hash, vector) pairs
+        if not items:
+            return
+        rows = [
+            (model, dimensions or 0, hash_, np.asarray(vector, dtype=np.float32).tobytes())
+            for hash_, vector in items
+        ]
+        with self._lock:
+            try:
+                self._conn.execute("BEGIN")
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model, dimensions, text_hash, vector) "
+                    "VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+                self._conn.execute("COMMIT")
+            except sqlite3.Error as e:
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                logger.error(f"Failed to save {len(rows)} embeddings to the cache: {e}")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,87 @@
+import os, json, shutil
+
+import numpy as np
+
+from utils.logger import logger
+
+# One directory per document index: the normalised chunk vectors as .npy,
+# opened with mmap so reloading costs no copy, the per-row scales of int8
+# vectors, and the chunk texts and metadata. Least recently used indexes are
+# removed once the directory grows past VECTOR_INDEX_MAX_BYTES.
+VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", os.path.join("cache", "indexes"))
+VECTOR_INDEX_MAX_BYTES = int(os.getenv("VECTOR_INDEX_MAX_BYTES", str(2 * 1024**3)))
+
+
+def _index_dir(key):
+    return os.path.join(VECTOR_INDEX_DIR, key)
+
+
+def _dir_size(path):
+    return sum(
+        os.path.getsize(os.path.join(path, name))
+        for name in os.listdir(path)
+        if os.path.isfile(os.path.join(path, name))
+    )
+
+
+def load_index(key):
+    # Returns (texts, metadatas, matrix, scales) with matrix memory-mapped
+    # read-only; scales is None unless the vectors are int8
+    if not key:
+        return None
+    path = _index_dir(key)
+    if not os.path.isdir(path):
+        return None
+    try:
+        with open(os.path.join(path, "chunks.json"), "r") as f:
+            chunks = json.load(f)
+        matrix = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        scales_path = os.path.join(path, "scales.npy")
+        scales = np.load(scales_path) if os.path.exists(scales_path) else None
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Ignoring unreadable vector index {path}: {e}")
+        return None
+    # The directory mtime records last use for eviction
+    os.utime(path)
+    return chunks["texts"], chunks["metadatas"], matrix, scales
+
+
+def save_index(key, texts, metadatas, matrix, scales=None, max_bytes=VECTOR_INDEX_MAX_BYTES):
+    if not key:
+        return
+    path = _index_dir(key)
+    tmp_path = f"{path}.tmp"
+    try:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        np.save(os.path.join(tmp_path, "vectors.npy"), np.ascontiguousarray(matrix))
+        if scales is not None:
+            np.save(os.path.join(tmp_path, "scales.npy"), scales)
+        with open(os.path.join(tmp_path, "chunks.json"), "w") as f:
+            json.dump({"texts": texts, "metadatas": metadatas}, f)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        logger.error(f"Failed to save vector index {key}: {e}")
+        return
+    evict_indexes(max_bytes)
+
+
+def evict_indexes(max_bytes=VECTOR_INDEX_MAX_BYTES):
+    # Removes least recently used indexes until the total fits the budget
+    if not os.path.isdir(VECTOR_INDEX_DIR):
+        return
+    entries = []
+    for name in os.listdir(VECTOR_INDEX_DIR):
+        path = os.path.join(VECTOR_INDEX_DIR, name)
+        if os.path.isdir(path) and not name.endswith(".tmp"):
+            entries.append((os.path.getmtime(path), _dir_size(path), path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+        logger.info(f"Evicted vector index {os.path.basename(path)} ({size} bytes)")
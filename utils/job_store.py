@@ -0,0 +1,162 @@
+import os, sqlite3, threading, time
+
+from utils.logger import logger
+from utils.common import load_processed_file_ids
+
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", "jobs.db")
+# Failed jobs are retried until they have been attempted this many times
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+# Per-document job states, in pipeline order
+QUEUED = "queued"
+DOWNLOADING = "downloading"
+EXTRACTING = "extracting"
+WRITING = "writing"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobStore:
+    """
+    SQLite-backed record of every document the pipeline has seen.
+
+    Each state change is a single indexed UPDATE committed immediately, so a
+    crash loses at most the stage that was running and a restart can resume
+    the jobs that never reached "done".
+    """
+
+    def __init__(self, db_path=JOB_DB_PATH, legacy_processed_file="processed_files.txt"):
+        self._lock = threading.Lock()
+        # Autocommit mode; the lock serialises access from worker threads
+        self._conn = sqlite3.connect(
+            db_path, check_same_thread=False, isolation_level=None
+        )
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    file_id TEXT PRIMARY KEY,
+                    file_name TEXT,
+                    md5_checksum TEXT,
+                    size INTEGER,
+                    modified_time TEXT,
+                    state TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (state)"
+            )
+        self._import_legacy_file(legacy_processed_file)
+
+    def _import_legacy_file(self, filename):
+        # One-off migration from processed_files.txt, which only recorded "done"
+        if not filename or not os.path.exists(filename):
+            return
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+        if count:
+            return
+        file_ids = [file_id for file_id in load_processed_file_ids(filename) if file_id]
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO jobs (file_id, state, attempts, created_at, updated_at) "
+                "VALUES (?, ?, 1, ?, ?)",
+                [(file_id, DONE, now, now) for file_id in file_ids],
+            )
+            self._conn.execute("COMMIT")
+        logger.info(f"Imported {len(file_ids)} processed files from {filename}.")
+
+    def enqueue(self, file):
+        """
+        Records a Drive file as a job. Returns True when it still needs
+        processing, i.e. it is not done and has attempts left. A known file
+        whose md5Checksum has changed was replaced in Drive, so its job starts
+        over as queued with no attempts used.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO jobs (file_id, file_name, md5_checksum, size, modified_time,
+                                  state, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (file_id) DO UPDATE SET
+                    state = CASE WHEN excluded.md5_checksum != jobs.md5_checksum
+                                 THEN excluded.state ELSE jobs.state END,
+                    attempts = CASE WHEN excluded.md5_checksum != jobs.md5_checksum
+                                    THEN 0 ELSE jobs.attempts END,
+                    last_error = CASE WHEN excluded.md5_checksum != jobs.md5_checksum
+                                      THEN NULL ELSE jobs.last_error END,
+                    updated_at = CASE WHEN excluded.md5_checksum != jobs.md5_checksum
+                                      THEN excluded.updated_at ELSE jobs.updated_at END,
+                    file_name = excluded.file_name,
+                    md5_checksum = COALESCE(excluded.md5_checksum, jobs.md5_checksum),
+                    size = COALESCE(excluded.size, jobs.size),
+                    modified_time = COALESCE(excluded.modified_time, jobs.modified_time)
+                """,
+                (
+                    file["id"],
+                    file.get("name"),
+                    file.get("md5Checksum"),
+                    file.get("size"),
+                    file.get("modifiedTime"),
+                    QUEUED,
+                    now,
+                    now,
+                ),
+            )
+            row = self._conn.execute(
+                "SELECT state, attempts FROM jobs WHERE file_id = ?", (file["id"],)
+            ).fetchone()
+        return row["state"] != DONE and row["attempts"] < JOB_MAX_ATTEMPTS
+
+    def start_attempt(self, file_id):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET state = ?, attempts = attempts + 1, last_error = NULL, "
+                "updated_at = ? WHERE file_id = ?",
+                (DOWNLOADING, time.time(), file_id),
+            )
+
+    def set_state(self, file_id, state, error=None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET state = ?, last_error = ?, updated_at = ? WHERE file_id = ?",
+                (state, error, time.time(), file_id),
+            )
+
+    def unfinished_jobs(self):
+        """
+        Returns Drive-style file dicts for jobs that were interrupted or failed
+        with attempts left, so they can be fed straight back into the pipeline.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT file_id, file_name, md5_checksum, size, modified_time FROM jobs "
+                "WHERE state != ? AND attempts < ? AND file_name IS NOT NULL",
+                (DONE, JOB_MAX_ATTEMPTS),
+            ).fetchall()
+        return [
+            {
+                "id": row["file_id"],
+                "name": row["file_name"],
+                "md5Checksum": row["md5_checksum"],
+                "size": row["size"],
+                "modifiedTime": row["modified_time"],
+            }
+            for row in rows
+        ]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
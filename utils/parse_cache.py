@@ -0,0 +1,41 @@
+import os, gzip, json
+
+from utils.logger import logger
+
+# Compressed per-page text keyed by PDF content hash and parser version. Unlike
+# checkpoints these entries outlive the job, so re-runs and prompt iteration
+# over the same corpus skip parsing entirely.
+PARSE_CACHE_DIR = os.getenv("PARSE_CACHE_DIR", os.path.join("cache", "pages"))
+
+
+def _cache_path(content_hash, parser_version):
+    return os.path.join(PARSE_CACHE_DIR, f"{content_hash}-{parser_version}.json.gz")
+
+
+def load_parsed_pages(content_hash, parser_version):
+    if not content_hash:
+        return None
+    path = _cache_path(content_hash, parser_version)
+    if not os.path.exists(path):
+        return None
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return json.load(f)["pages"]
+    except (OSError, EOFError, KeyError, json.JSONDecodeError) as e:
+        logger.warning(f"Ignoring unreadable parse cache entry {path}: {e}")
+        return None
+
+
+def save_parsed_pages(content_hash, parser_version, pages):
+    # pages is a list of {"page_content", "metadata"} dicts
+    if not content_hash:
+        return
+    try:
+        os.makedirs(PARSE_CACHE_DIR, exist_ok=True)
+        path = _cache_path(content_hash, parser_version)
+        tmp_path = f"{path}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=6) as f:
+            json.dump({"parser_version": parser_version, "pages": pages}, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.error(f"Failed to save parse cache entry for {content_hash}: {e}")
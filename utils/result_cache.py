@@ -0,0 +1,49 @@
+import os, json, hashlib
+
+from utils.logger import logger
+
+# Content-addressed store of extraction results, keyed by the PDF's MD5 checksum
+# and a digest of the extraction settings
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR", os.path.join("cache", "results"))
+
+
+def result_key(content_hash, settings):
+    # A change to the prompts, model or extraction settings gives a new key,
+    # so results from the old configuration are never served
+    if not content_hash:
+        return None
+    digest = hashlib.md5(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()
+    return f"{content_hash}-{digest[:12]}"
+
+
+def _result_path(key):
+    return os.path.join(RESULT_CACHE_DIR, f"{key}.json")
+
+
+def load_cached_result(key):
+    if not key:
+        return None
+    path = _result_path(key)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning(f"Ignoring unreadable cached result {path}: {e}")
+        return None
+
+
+def save_cached_result(key, extracted_data):
+    if not key:
+        return
+    try:
+        os.makedirs(RESULT_CACHE_DIR, exist_ok=True)
+        path = _result_path(key)
+        # Write to a temporary file first so a crash never leaves a partial entry
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(extracted_data, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.error(f"Failed to save cached result for {key}: {e}")
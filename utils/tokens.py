@@ -0,0 +1,18 @@
+from functools import lru_cache
+
+import tiktoken
+
+EMBEDDING_MODEL = "text-embedding-3-large"
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model=EMBEDDING_MODEL):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        # Newer embedding models share the cl100k_base tokenizer
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text, model=EMBEDDING_MODEL):
+    return len(get_encoding(model).encode(text, disallowed_special=()))
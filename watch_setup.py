@@ -3,10 +3,16 @@ import time
 import uuid
 import threading
 import json
-from googleapiclient.discovery import build
-from services.google_services import load_service_account_credentials
+from services.google_services import (
+    DRIVE_API_ERRORS,
+    load_service_account_credentials,
+    create_drive_client,
+    get_start_page_token,
+    watch_changes,
+    stop_channel,
+)
 from utils.logger import logger
-from googleapiclient.errors import HttpError
+from utils.common import save_start_page_token
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -33,30 +39,23 @@ def load_watch_info():
     return None
 
 
-def save_start_page_token(token):
-    with open(START_PAGE_TOKEN_FILE, "w") as f:
-        f.write(token)
-
-
-def load_start_page_token():
-    if os.path.exists(START_PAGE_TOKEN_FILE):
-        with open(START_PAGE_TOKEN_FILE, "r") as f:
-            return f.read()
-    return None
-
-
 def setup_watch():
     credentials = load_service_account_credentials(SERVICE_ACCOUNT_FILE, SCOPES)
-    drive_service = build("drive", "v3", credentials=credentials)
+    drive_service = create_drive_client(credentials)
+    try:
+        start_watch(drive_service)
+    finally:
+        drive_service.close()
+
 
+def start_watch(drive_service):
     # Generate a unique channel ID
     channel_id = str(uuid.uuid4())
     webhook_address = "https://webhook.site/419ea69a-8ce0-43ae-8faf-440e401c5281/webhook"  # Replace with your webhook URL
 
     # Get the start page token
-    start_page_token_response = drive_service.changes().getStartPageToken().execute()
-    start_page_token = start_page_token_response.get("startPageToken")
-    save_start_page_token(start_page_token)
+    start_page_token = get_start_page_token(drive_service)
+    save_start_page_token(START_PAGE_TOKEN_FILE, start_page_token)
 
     channel = {
         "id": channel_id,
@@ -68,15 +67,7 @@ def setup_watch():
 
     try:
         # Set up the watch on the Drive changes feed using the start page token
-        response = (
-            drive_service.changes()
-            .watch(
-                body=channel,
-                pageToken=start_page_token,
-                fields="*",  # Optional: specify fields to include in the response
-            )
-            .execute()
-        )
+        response = watch_changes(drive_service, start_page_token, channel)
         logger.info(f"Watch setup response: {response}")
 
         # Save watch information
@@ -88,14 +79,22 @@ def setup_watch():
         save_watch_info(watch_info)
         logger.info(f"Watch will expire at {watch_info['expiration']}")
 
-    except HttpError as error:
+    except DRIVE_API_ERRORS as error:
         logger.error(f"An error occurred while setting up the watch: {error}")
 
 
 def renew_watch():
     credentials = load_service_account_credentials(SERVICE_ACCOUNT_FILE, SCOPES)
-    drive_service = build("drive", "v3", credentials=credentials)
+    drive_service = create_drive_client(credentials)
+    try:
+        stop_watch(drive_service)
+        # Set up a new watch
+        start_watch(drive_service)
+    finally:
+        drive_service.close()
 
+
+def stop_watch(drive_service):
     watch_info = load_watch_info()
     if watch_info:
         channel_id = watch_info.get("channel_id")
@@ -103,19 +102,11 @@ def renew_watch():
 
         # Stop the existing watch
         try:
-            drive_service.channels().stop(
-                body={
-                    "id": channel_id,
-                    "resourceId": resource_id,
-                }
-            ).execute()
+            stop_channel(drive_service, channel_id, resource_id)
             logger.info(f"Stopped existing watch with channel ID {channel_id}")
-        except HttpError as error:
+        except DRIVE_API_ERRORS as error:
             logger.error(f"An error occurred while stopping the watch: {error}")
 
-    # Set up a new watch
-    setup_watch()
-
 
 def watch_renewal_scheduler():
     while True:
@@ -1,14 +1,19 @@
 from flask import Flask, request
 import threading
+import queue
 import json
 import os
-from googleapiclient.discovery import build
 from services.google_services import (
     load_service_account_credentials,
-    download_pdf_from_drive,
+    create_drive_client,
+    list_changed_pdfs,
+    get_thread_local_service,
 )
+from services.download_manager import DownloadManager
 from main import process_file  # Import your file processing function
 from utils.logger import logger
+from utils.common import load_start_page_token, save_start_page_token
+from utils.job_store import JobStore, DONE, FAILED
 
 app = Flask(__name__)
 
@@ -16,27 +21,35 @@ app = Flask(__name__)
 SERVICE_ACCOUNT_FILE = os.getenv("SERVICE_ACCOUNT_FILE")
 SPREADSHEET_ID = os.getenv("SPREADSHEET_ID")
 FOLDER_ID = os.getenv("FOLDER_ID")
+START_PAGE_TOKEN_FILE = "start_page_token.txt"
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "2"))
+# Each queued document can hold an in-memory PDF of up to IN_MEMORY_MAX_BYTES,
+# so the queue only buffers about one document per worker by default
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", str(WEBHOOK_WORKERS)))
 SCOPES = [
     "https://www.googleapis.com/auth/drive",
     "https://www.googleapis.com/auth/spreadsheets",
 ]
 
-# Initialize credentials and services
-credentials = load_service_account_credentials(SERVICE_ACCOUNT_FILE, SCOPES)
-drive_service = build("drive", "v3", credentials=credentials)
-sheets_service = build("sheets", "v4", credentials=credentials)
-
-
-def save_start_page_token(token):
-    with open("start_page_token.txt", "w") as f:
-        f.write(token)
-
-
-def load_start_page_token():
-    if os.path.exists("start_page_token.txt"):
-        with open("start_page_token.txt", "r") as f:
-            return f.read()
-    return None
+# Credentials and services are created by create_app(), not at import time:
+# PDF parse workers are spawned processes that re-import the entry script, and
+# must not open the job store or start their own background workers
+credentials = None
+# Only the change consumer thread uses drive_service; workers build their own
+drive_service = None
+download_manager = None
+job_store = None
+_app_initialized = False
+_app_init_lock = threading.Lock()
+
+# Notifications only set this event. A single consumer thread drains the change
+# feed, so a burst of notifications collapses into at most one follow-up drain.
+drain_requested = threading.Event()
+# Downloaded documents waiting for a worker; the consumer blocks when it is full
+document_queue = queue.Queue(maxsize=WEBHOOK_QUEUE_SIZE)
+# File IDs that are queued or being processed, so overlapping drains skip them
+in_flight_file_ids = set()
+in_flight_lock = threading.Lock()
 
 
 @app.route("/webhook", methods=["POST"])
@@ -53,8 +66,8 @@ def webhook():
         logger.info("Sync notification received.")
         return "", 200
 
-    # Handle the notification in a separate thread
-    threading.Thread(target=handle_change).start()
+    # Ask the change consumer for a drain; coalesces with any pending request
+    drain_requested.set()
 
     return "", 200
 
@@ -109,51 +122,134 @@ sheet_headers = {
 
 def handle_change():
     # Load the saved start page token
-    saved_start_page_token = load_start_page_token()
+    saved_start_page_token = load_start_page_token(START_PAGE_TOKEN_FILE)
+    if saved_start_page_token is None:
+        logger.warning("No start page token saved yet; run watch_setup.py first.")
+        return
 
     # Fetch changes since the last saved token
-    page_token = saved_start_page_token
-    while page_token is not None:
-        response = (
-            drive_service.changes()
-            .list(
-                pageToken=page_token,
-                spaces="drive",
-                fields="nextPageToken,newStartPageToken,changes(fileId,file(name,parents,mimeType))",
+    new_files, new_start_page_token = list_changed_pdfs(
+        drive_service, saved_start_page_token, FOLDER_ID
+    )
+    files = record_files(new_files)
+    # Only advance the token once its changes are in the job store; if recording
+    # raised, the next drain re-reads them from the saved token
+    if new_start_page_token:
+        save_start_page_token(START_PAGE_TOKEN_FILE, new_start_page_token)
+
+    download_and_queue(files)
+
+
+def queue_files(files):
+    download_and_queue(record_files(files))
+
+
+def record_files(files):
+    # Records the files as jobs and returns the ones to process, skipping files
+    # that are done, out of attempts or already queued by an earlier drain
+    with in_flight_lock:
+        files = [
+            file
+            for file in files
+            if file.get("id") not in in_flight_file_ids and job_store.enqueue(file)
+        ]
+        in_flight_file_ids.update(file.get("id") for file in files)
+    try:
+        for file in files:
+            job_store.start_attempt(file["id"])
+    except Exception:
+        # Release the IDs so the drain that re-reads these changes can queue them
+        with in_flight_lock:
+            in_flight_file_ids.difference_update(file.get("id") for file in files)
+        raise
+    return files
+
+
+def download_and_queue(files):
+    # Download the files in parallel and queue them as they arrive
+    for file, pdf_source in download_manager.download_many(
+        files, on_failure=download_failed
+    ):
+        document_queue.put((file, pdf_source))
+
+
+def download_failed(file):
+    job_store.set_state(file["id"], FAILED, "Download failed")
+    # Release the ID so a later drain can retry it
+    with in_flight_lock:
+        in_flight_file_ids.discard(file.get("id"))
+
+
+def change_consumer():
+    # Resume jobs that a previous run left unfinished
+    try:
+        queue_files(job_store.unfinished_jobs())
+    except Exception as e:
+        logger.error(f"An error occurred while resuming unfinished jobs: {e}")
+
+    # Single-flight drain loop: only this thread reads the start page token
+    while True:
+        drain_requested.wait()
+        drain_requested.clear()
+        try:
+            handle_change()
+        except Exception as e:
+            logger.error(f"An error occurred while handling Drive changes: {e}")
+
+
+def document_worker():
+    while True:
+        file, pdf_source = document_queue.get()
+        file_name = file.get("name")
+        try:
+            logger.info(f"Processing new file: {file_name} ({file.get('id')})")
+            succeeded = process_file(
+                file_name,
+                pdf_source,
+                sheets_service=get_thread_local_service(credentials, "sheets", "v4"),
+                SPREADSHEET_ID=SPREADSHEET_ID,
+                sheet_headers=sheet_headers,
+                content_hash=file.get("md5Checksum"),
+                on_stage=lambda stage: job_store.set_state(file["id"], stage),
             )
-            .execute()
-        )
-
-        for change in response.get("changes"):
-            file = change.get("file")
-            if file and file.get("mimeType") == "application/pdf":
-                parents = file.get("parents", [])
-                if FOLDER_ID in parents:
-                    file_id = file.get("id")
-                    file_name = file.get("name")
-                    logger.info(f"Processing new file: {file_name} ({file_id})")
-
-                    # Download and process the new file
-                    file_path = download_pdf_from_drive(
-                        drive_service, file_id, file_name
-                    )
-                    if file_path:
-                        process_file(
-                            file_name,
-                            file_path,
-                            sheets_service=sheets_service,
-                            SPREADSHEET_ID=SPREADSHEET_ID,
-                            sheet_headers=sheet_headers,
-                        )
-
-        page_token = response.get("nextPageToken")
-        if not page_token:
-            # Save the new start page token
-            new_start_page_token = response.get("newStartPageToken")
-            if new_start_page_token:
-                save_start_page_token(new_start_page_token)
-            break
+            if succeeded:
+                job_store.set_state(file["id"], DONE)
+            else:
+                job_store.set_state(file["id"], FAILED, "Processing failed")
+        except Exception as e:
+            logger.error(f"An error occurred while processing {file_name}: {e}")
+            job_store.set_state(file["id"], FAILED, str(e))
+        finally:
+            with in_flight_lock:
+                in_flight_file_ids.discard(file.get("id"))
+            document_queue.task_done()
+
+
+def start_background_workers():
+    threading.Thread(target=change_consumer, name="change-consumer", daemon=True).start()
+    for i in range(WEBHOOK_WORKERS):
+        threading.Thread(
+            target=document_worker, name=f"document-worker-{i}", daemon=True
+        ).start()
+
+
+def create_app():
+    """
+    Initialises credentials, services and the job store, starts the background
+    workers once per process and returns the Flask app. Use it as the WSGI
+    entry point, e.g. gunicorn "webhook_app:create_app()".
+    """
+    global credentials, drive_service, download_manager, job_store, _app_initialized
+    with _app_init_lock:
+        if not _app_initialized:
+            credentials = load_service_account_credentials(SERVICE_ACCOUNT_FILE, SCOPES)
+            drive_service = create_drive_client(credentials)
+            download_manager = DownloadManager(credentials)
+            job_store = JobStore()
+            start_background_workers()
+            _app_initialized = True
+    return app
 
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000)
+    create_app().run(host="0.0.0.0", port=5000)